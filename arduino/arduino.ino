@@ -37,6 +37,52 @@ void parseConfigFromBytes(const uint8_t* data, size_t dataLength, Config &out) {
 }
 
 
+bool readBytesWithin(uint8_t* dst, int count, unsigned long timeout_ms) {
+  int bytes_read = 0;
+  unsigned long start_time = millis();
+  while (bytes_read < count && (millis() - start_time) < timeout_ms) {
+    if (Serial.available() > 0) {
+      bytes_read += Serial.readBytes((char*)(dst + bytes_read), count - bytes_read);
+    }
+  }
+  return bytes_read == count;
+}
+
+
+// 'c' frame: <range_count> then per range <start> <length> <length * 3 bytes>.
+// LEDs outside the ranges keep their previous color.
+void readDeltaFrame() {
+  uint8_t range_count;
+  if (!readBytesWithin(&range_count, 1, 1000)) {
+    Serial.println("ERROR: Delta header timeout");
+    while(Serial.available()) Serial.read();
+    return;
+  }
+
+  for (uint8_t r = 0; r < range_count; r++) {
+    uint8_t range[2];
+    if (!readBytesWithin(range, 2, 1000)) {
+      Serial.println("ERROR: Delta range timeout");
+      while(Serial.available()) Serial.read();
+      return;
+    }
+    if ((int)range[0] + range[1] > config.led_count) {
+      Serial.println("ERROR: Delta range out of bounds");
+      while(Serial.available()) Serial.read();
+      return;
+    }
+    if (!readBytesWithin((uint8_t*)(leds + range[0]), range[1] * 3, 1000)) {
+      Serial.println("ERROR: Delta data timeout");
+      while(Serial.available()) Serial.read();
+      return;
+    }
+  }
+
+  FastLED.show();
+  Serial.println("OK");
+}
+
+
 void starting_effect(CRGB* leds, int count) {
   if (setup_completed) return;
   for (int i = 0; i < count; i++) {
@@ -120,6 +166,9 @@ void loop() {
         while(Serial.available()) Serial.read();
       }
 
+    } else if (command == 'c') {
+      readDeltaFrame();
+
     } else if (command == 'w') {
       unsigned long startTime = millis();
       while (Serial.available() < sizeof(Config)) {
@@ -142,7 +191,8 @@ void loop() {
     }
 
     else if (command == 't') {
-      Serial.println("ALIVE");
+      // Words after ALIVE list optional commands this sketch understands.
+      Serial.println("ALIVE delta");
     } else {
       while (Serial.available()) Serial.read(); 
     }
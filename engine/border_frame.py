@@ -0,0 +1,85 @@
+import numpy as np
+
+
+class BorderFrame:
+    """
+    The four margin-wide edge strips of a frame, packed into one (P, 3) RGB buffer.
+
+    Strips are stored top, bottom, left, right. Top and bottom span the full
+    width; left and right cover only the rows between them, so no pixel is
+    stored twice. `shape` is the shape of the full frame the strips came from.
+    """
+
+    def __init__(self, frame_shape, margin, pixels=None):
+        h, w = frame_shape[:2]
+        self.shape = (h, w, 3)
+        self.margin = margin
+        self.regions = self.border_regions(h, w, margin)
+        size = sum(height * width for _, _, _, height, width, _ in self.regions)
+        self.pixels = pixels if pixels is not None else np.zeros((size, 3), dtype=np.uint8)
+
+
+    @staticmethod
+    def border_regions(h, w, margin):
+        """
+        Returns (name, top, left, height, width, offset) for each strip, where
+        offset is the first pixel of the strip in the packed buffer.
+        """
+        regions = []
+        offset = 0
+        for name, top, left, height, width in (
+            ("top", 0, 0, margin, w),
+            ("bottom", h - margin, 0, margin, w),
+            ("left", margin, 0, h - 2 * margin, margin),
+            ("right", margin, w - margin, h - 2 * margin, margin),
+        ):
+            regions.append((name, top, left, height, width, offset))
+            offset += height * width
+        return regions
+
+
+    @staticmethod
+    def pixel_index(rows, cols, frame_shape, margin):
+        """
+        Map frame coordinates to offsets in the packed buffer.
+        Raises ValueError if a pixel lies outside the border ring.
+        """
+        h, w = frame_shape[:2]
+        rows = np.asarray(rows)
+        cols = np.asarray(cols)
+        side_offset = 2 * margin * w
+        side_size = (h - 2 * margin) * margin
+
+        index = np.full(rows.shape, -1, dtype=np.intp)
+
+        top = rows < margin
+        bottom = rows >= h - margin
+        middle = ~(top | bottom)
+        left = middle & (cols < margin)
+        right = middle & (cols >= w - margin)
+
+        index[top] = rows[top] * w + cols[top]
+        index[bottom] = margin * w + (rows[bottom] - (h - margin)) * w + cols[bottom]
+        index[left] = side_offset + (rows[left] - margin) * margin + cols[left]
+        index[right] = side_offset + side_size + (rows[right] - margin) * margin + cols[right] - (w - margin)
+
+        if np.any(index < 0):
+            raise ValueError(f"Sampling area is outside the {margin}px border ring.")
+        return index
+
+
+    def strip(self, name):
+        for region_name, _, _, height, width, offset in self.regions:
+            if region_name == name:
+                return self.pixels[offset:offset + height * width].reshape(height, width, 3)
+        raise KeyError(name)
+
+
+    def to_image(self):
+        """
+        Full-size RGB frame with the strips in place and a black interior (for debug/preview).
+        """
+        image = np.zeros(self.shape, dtype=np.uint8)
+        for name, top, left, height, width, _ in self.regions:
+            image[top:top + height, left:left + width] = self.strip(name)
+        return image
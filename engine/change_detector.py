@@ -0,0 +1,59 @@
+import time
+import zlib
+import numpy as np
+
+FULL_FRAME_SAMPLE_STEP = 8  # full frames are compared on every 8th row and column
+
+
+class FrameChangeDetector:
+    """
+    Cheap check for whether a captured frame can change the LED output.
+
+    A CRC32 of the border strips (or of a subsampled full frame) plus the
+    current brightness controls is compared with the previous frame's. When
+    nothing changed, extraction and sending can be skipped; keepalive_due()
+    still asks for a resend every keepalive_interval seconds so the device
+    keeps hearing from the host.
+    """
+
+    def __init__(self, keepalive_interval=1.0, enabled=True):
+        self.enabled = enabled
+        self.keepalive_interval = keepalive_interval
+        self._signature = None
+        self._last_sent = 0.0
+
+
+    @staticmethod
+    def signature(frame, controls=()):
+        pixels = getattr(frame, "pixels", None)
+        if pixels is None:
+            pixels = np.ascontiguousarray(frame[::FULL_FRAME_SAMPLE_STEP, ::FULL_FRAME_SAMPLE_STEP])
+        signature = zlib.crc32(pixels)
+        signature = zlib.crc32(repr((pixels.shape, tuple(controls))).encode(), signature)
+        return signature
+
+
+    def has_changed(self, frame, controls=()):
+        """
+        True if the frame (or the controls) differ from the previous call.
+        Always True when detection is disabled.
+        """
+        if not self.enabled:
+            return True
+        signature = self.signature(frame, controls)
+        changed = signature != self._signature
+        self._signature = signature
+        return changed
+
+
+    def keepalive_due(self):
+        return time.monotonic() - self._last_sent >= self.keepalive_interval
+
+
+    def mark_sent(self):
+        self._last_sent = time.monotonic()
+
+
+    def reset(self):
+        self._signature = None
+        self._last_sent = 0.0
@@ -0,0 +1,192 @@
+import threading
+import time
+import numpy as np
+from tools.logger import setup_logger
+
+logger = setup_logger("ColorLUT")
+
+FULL_LUT_SIZE = 256  # one entry per 8-bit RGB color (48 MB), looked up without interpolation
+FULL_LUT_CHUNK = 16  # red planes computed per step while building the full table
+
+
+class ColorLUT:
+    """
+    The whole color correction chain (brightness and white balance gains, an
+    optional 3x3 color matrix, the brightness cutoff remap and gamma) baked
+    into a cached 3D lookup table.
+
+        size 2-255  a size^3 grid of pre-gamma values, read with trilinear
+                    interpolation; gamma is applied afterwards through the
+                    256-entry gamma table, where interpolation would be least exact
+        size 256    a full 256^3 table of final colors, a single gather per LED
+
+    Every step before gamma is piecewise linear and, without a color matrix,
+    each output channel depends on one input only. Grid levels are placed on
+    the clipping points, so the grid then reproduces the direct computation.
+    With a matrix the clipping cells are approximated. Colors whose brightest
+    channel is below the cutoff already remap to 0, so the too-dark check of
+    the direct path needs no step of its own. The table is rebuilt only when
+    the brightness, the cutoff or the coefficients change, on a background
+    thread; tables are built lazily, so an unused copy costs no memory.
+    """
+
+    def __init__(self, gamma_table, size=33, color_matrix=None):
+        self.gamma_table = gamma_table
+        self.size = max(2, min(FULL_LUT_SIZE, int(size)))
+        self.color_matrix = None if color_matrix is None else np.asarray(color_matrix, dtype=np.float32).reshape(3, 3)
+        # (key, table, cell, fraction) of the table in use, replaced as a whole by the builder.
+        self._state = None
+        self._pending = None
+        self._builder = None
+        self._lock = threading.Lock()
+        strides = (self.size * self.size, self.size, 1)
+        self._corner_offsets = np.array([
+            dr * strides[0] + dg * strides[1] + db
+            for dr in (0, 1) for dg in (0, 1) for db in (0, 1)
+        ], dtype=np.intp)
+
+
+    def correct(self, colors, gains, min_brightness_clip):
+        """
+        The correction chain computed directly on (..., 3) colors. Returns uint8 colors.
+        """
+        return self.gamma_table[self._pre_gamma(colors, gains, min_brightness_clip)]
+
+
+    def _pre_gamma(self, colors, gains, min_brightness_clip, as_float=False):
+        scaled = colors * gains
+        if self.color_matrix is not None:
+            scaled = scaled @ self.color_matrix.T
+
+        scale_range = max(1, 255 - min_brightness_clip)
+        adjusted = np.clip((scaled - min_brightness_clip) * (255.0 / scale_range), 0, 255)
+        if as_float:
+            return adjusted.astype(np.float32)
+        return adjusted.astype(np.uint8)
+
+
+    def _axis(self, gain, min_brightness_clip):
+        """
+        Grid levels of one input channel, with the nearest levels moved onto the
+        inputs where the remap clips (at the cutoff and at full scale), so the
+        interpolation stays exact on both sides of them.
+        """
+        levels = np.linspace(0, 255, self.size, dtype=np.float64)
+        if gain <= 0 or self.size < 4:
+            return levels
+        for kink in (min_brightness_clip / gain, 255.0 / gain):
+            if 0 < kink < 255:
+                nearest = int(np.clip(np.argmin(np.abs(levels - kink)), 1, self.size - 2))
+                levels[nearest] = kink
+        return np.sort(levels)
+
+
+    def update(self, gains, min_brightness_clip):
+        """
+        Request a table for these gains and cutoff. Tables are built on a
+        background thread and swapped in when done, so a brightness change never
+        stalls the caller. Returns True if the current table matches; until then
+        the caller should use correct() instead.
+        """
+        key = (tuple(float(gain) for gain in gains), float(min_brightness_clip))
+        state = self._state
+        if state is not None and state[0] == key:
+            return True
+
+        with self._lock:
+            if self._pending is None or self._pending[0] != key:
+                self._pending = (key, np.asarray(gains, dtype=np.float32), min_brightness_clip)
+            if self._builder is None:
+                self._builder = threading.Thread(target=self._build_pending, name="ColorLUTBuilder", daemon=True)
+                self._builder.start()
+        return False
+
+
+    def _build_pending(self):
+        # Builds the latest request until none is left; requests made meanwhile replace each other.
+        while True:
+            with self._lock:
+                request = self._pending
+                self._pending = None
+                if request is None:
+                    self._builder = None
+                    return
+            key, gains, min_brightness_clip = request
+            try:
+                start = time.perf_counter()
+                self._state = (key,) + self._build(gains, min_brightness_clip)
+                logger.debug(f"Color LUT {self.size}^3 rebuilt in {(time.perf_counter() - start) * 1000:.1f} ms")
+            except Exception as e:
+                logger.error(f"Color LUT build failed: {e}")
+
+
+    def _build(self, gains, min_brightness_clip):
+        """
+        Returns (table, cell, fraction); cell and fraction are None for a full table.
+        """
+        if self.size == FULL_LUT_SIZE:
+            levels = np.arange(256, dtype=np.float32)
+            table = np.empty((256, 256, 256, 3), dtype=np.uint8)
+            if self.color_matrix is None:
+                # Without a matrix every output channel depends on one input only.
+                ramp = np.repeat(levels[:, None], 3, axis=1)
+                curves = self.correct(ramp, gains, min_brightness_clip)
+                table[..., 0] = curves[:, None, None, 0]
+                table[..., 1] = curves[None, :, None, 1]
+                table[..., 2] = curves[None, None, :, 2]
+            else:
+                g, b = np.meshgrid(levels, levels, indexing="ij")
+                plane = np.empty((256, 256, 3), dtype=np.float32)
+                plane[..., 1] = g
+                plane[..., 2] = b
+                for red in range(0, 256, FULL_LUT_CHUNK):
+                    chunk = np.repeat(plane[None], FULL_LUT_CHUNK, axis=0)
+                    chunk[..., 0] = levels[red:red + FULL_LUT_CHUNK, None, None]
+                    table[red:red + FULL_LUT_CHUNK] = self.correct(chunk, gains, min_brightness_clip)
+            return table, None, None
+
+        if self.color_matrix is None:
+            axes = [self._axis(gain, min_brightness_clip) for gain in gains]
+        else:
+            axes = [np.linspace(0, 255, self.size)] * 3
+        r, g, b = np.meshgrid(*axes, indexing="ij")
+        grid = np.stack([r, g, b], axis=-1).astype(np.float32)
+        table = self._pre_gamma(grid, gains, min_brightness_clip, as_float=True).reshape(-1, 3)
+
+        # Per channel and 8-bit input: flat offset of the grid cell and the position inside it.
+        strides = (self.size * self.size, self.size, 1)
+        inputs = np.arange(256, dtype=np.float64)
+        cell = []
+        fraction = []
+        for axis, stride in zip(axes, strides):
+            index = np.clip(np.searchsorted(axis, inputs, side="right") - 1, 0, self.size - 2)
+            cell.append(index * stride)
+            fraction.append(((inputs - axis[index]) / (axis[index + 1] - axis[index])).astype(np.float32))
+        return table, cell, fraction
+
+
+    def apply(self, colors):
+        """
+        colors: (N, 3) array of 8-bit colors (other values are rounded).
+        Returns a contiguous (N, 3) uint8 array. Only valid after update() returned True.
+        """
+        _, table, cell, fraction = self._state
+        rgb = np.clip(np.rint(colors), 0, 255).astype(np.intp)
+        if self.size == FULL_LUT_SIZE:
+            return np.ascontiguousarray(table[rgb[:, 0], rgb[:, 1], rgb[:, 2]])
+
+        # Trilinear interpolation between the 8 grid points around each color.
+        # Inputs are 8-bit, so each channel's grid cell and position in it come from a 256-entry table.
+        cells = cell[0][rgb[:, 0]] + cell[1][rgb[:, 1]] + cell[2][rgb[:, 2]]
+        fr = fraction[0][rgb[:, 0], None]
+        fg = fraction[1][rgb[:, 1], None]
+        fb = fraction[2][rgb[:, 2], None]
+        corners = table[cells[:, None] + self._corner_offsets]
+
+        c0 = (corners[:, 0] * (1 - fb) + corners[:, 1] * fb) * (1 - fg) + (corners[:, 2] * (1 - fb) + corners[:, 3] * fb) * fg
+        c1 = (corners[:, 4] * (1 - fb) + corners[:, 5] * fb) * (1 - fg) + (corners[:, 6] * (1 - fb) + corners[:, 7] * fb) * fg
+        adjusted = c0 * (1 - fr) + c1 * fr
+
+        # A small bias keeps exact integers from falling one step short of the direct computation.
+        adjusted = np.clip(adjusted + 1e-3, 0, 255).astype(np.uint8)
+        return np.ascontiguousarray(self.gamma_table[adjusted])
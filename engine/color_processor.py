@@ -1,33 +1,82 @@
 import cv2
-import math
 import numpy as np
 import json
+from engine.border_frame import BorderFrame
+from engine.color_lut import ColorLUT
+from engine.dominant_color import DominantColorSampler, COLOR_MODES
+from engine.letterbox import LetterboxDetector
+from engine.sampling_plan import SamplingPlan, ORDERINGS
+from engine.zone_layout import ZoneLayout
 from tools.logger import setup_logger
 
 logger = setup_logger("ColorProcessor")
 
+# Target source pixels per LED along each side; None samples at full resolution.
+SAMPLING_QUALITY_PIXELS_PER_LED = {
+    "full": None,
+    "balanced": 8,
+    "fast": 3
+}
+# Zones that need a border ring deeper than this share of the frame's short side are captured as full frames.
+ZONE_BORDER_MAX_DEPTH = 0.25
+
 class ColorProcessor: 
 
-    def __init__(self, led_config, margin=40, order="clockwise", start_side="bottom", enable_corners=False, gamma=2.2, coef_r=1.0, coef_g=1.0, coef_b=1.0):
+    def __init__(self, led_config, margin=40, order="clockwise", start_side="bottom", enable_corners=False, gamma=2.2, coef_r=1.0, coef_g=1.0, coef_b=1.0, sampling_quality="full", zone_layout=None, color_mode="mean", letterbox=None, color_lut_size=0, color_matrix=None):
         self.coef_r = coef_r
         self.coef_g = coef_g
         self.coef_b = coef_b
         self.gamma_table = np.array([int((i / 255) ** (1 / gamma) * 255 + 0.5) for i in range(256)], dtype=np.uint8)
+        # The correction chain baked into a 3D LUT; None computes it per LED instead.
+        self.color_lut = ColorLUT(self.gamma_table, color_lut_size, color_matrix) if color_lut_size else None
+        # Optional 3x3 calibration matrix applied after the gains (rows give output R, G, B).
+        self.color_matrix = None if color_matrix is None else np.asarray(color_matrix, dtype=np.float32).reshape(3, 3)
         self.led_config = led_config
         self.margin = max(1, int(margin))
         self.order = order.lower().replace("-", "").replace("_", "")
         self.start_side = start_side.lower()
         self.enable_corners = enable_corners
+        self._sampling_plan = None
+        self._sampling_plan_key = None
+        self._downscaled_frame = None
+        self._downscale_by = 1  # factor the frame being sampled was shrunk by
+        self._side_strips = {}  # joined side bands of a BorderFrame, by strip name
+        self._frame_shape = None  # (h, w) of the last frame, to size the next capture
+        # Optional ZoneLayout; replaces the led_config sides when the config lists "zones".
+        self.zone_layout = zone_layout
+        # Optional LetterboxDetector; LEDs then sample inside the detected black bars.
+        self.letterbox = letterbox
+
+        if sampling_quality not in SAMPLING_QUALITY_PIXELS_PER_LED:
+            logger.warning(f"Unknown sampling quality '{sampling_quality}', defaulting to 'full'.")
+            sampling_quality = "full"
+        self.sampling_quality = sampling_quality
 
-        total_leds = sum(self.led_config.values())
-        logger.info(f"Initialized with {total_leds} LEDs, margin={self.margin}, order={self.order}")
+        if color_mode not in COLOR_MODES:
+            logger.warning(f"Unknown color mode '{color_mode}', defaulting to 'mean'.")
+            color_mode = "mean"
+        self.color_mode = color_mode
+        self._color_sampler = None
+
+        total_leds = zone_layout.led_count if zone_layout else sum(self.led_config.values())
+        logger.info(f"Initialized with {total_leds} LEDs, margin={self.margin}, order={self.order}, color mode={self.color_mode}")
 
     @classmethod
     def from_config(cls, config_path="config/config.json"):
         try:
             with open(config_path) as f:
                 config = json.load(f)
+            logger.info(f"Configuration loaded from {config_path}")
+            return cls.from_dict(config)
+
+        except Exception as e:
+            logger.error(f"Failed to load configuration: {e}")
+            return cls({"top": 10, "right": 6, "bottom": 10, "left": 6})
 
+
+    @classmethod
+    def from_dict(cls, config):
+        try:
             led_config = config.get("led_config", {"top": 10, "right": 6, "bottom": 10, "left": 6})
             margin = config.get("margin", 40)
             order = config.get("order", "clockwise")
@@ -36,9 +85,12 @@ class ColorProcessor:
             coef_r = config.get("color_coefs", {}).get("coef_r", 1.0)
             coef_g = config.get("color_coefs", {}).get("coef_g", 1.0)
             coef_b = config.get("color_coefs", {}).get("coef_b", 1.0)
-
-
-            logger.info(f"Configuration loaded from {config_path}: {led_config}")
+            sampling_quality = config.get("sampling_quality", "full")
+            zone_layout = ZoneLayout.from_dict(config)
+            color_mode = config.get("color_mode", "mean")
+            letterbox = LetterboxDetector.from_dict(config)
+            color_lut_size = config.get("color_lut_size", 0)
+            color_matrix = config.get("color_matrix")
 
             return cls(
                 led_config=led_config, 
@@ -48,233 +100,255 @@ class ColorProcessor:
                 enable_corners=enable_corners,
                 coef_r=coef_r,
                 coef_g=coef_g,
-                coef_b=coef_b
+                coef_b=coef_b,
+                sampling_quality=sampling_quality,
+                zone_layout=zone_layout,
+                color_mode=color_mode,
+                letterbox=letterbox,
+                color_lut_size=color_lut_size,
+                color_matrix=color_matrix
             )
         
         except Exception as e:
             logger.error(f"Failed to load configuration: {e}")
             return cls({"top": 10, "right": 6, "bottom": 10, "left": 6})
     
+    @property
+    def capture_margin(self):
+        """
+        Border depth to capture: the margin plus any black bars the LEDs sample past. With zones, the
+        depth that holds every zone, or None when they need the full frame (also
+        before the frame size is known).
+        """
+        if self.zone_layout is not None:
+            if self._frame_shape is None:
+                return None
+            crop = self.letterbox.crop(self._frame_shape) if self.letterbox is not None else (0, 0, 0, 0)
+            depth = self.zone_layout.border_depth(self._frame_shape, crop)
+            if depth > min(self._frame_shape) * ZONE_BORDER_MAX_DEPTH:
+                return None
+            return depth
+
+        if self.letterbox is None:
+            return self.margin
+        top, _, left, _ = self.letterbox.bars
+        return self.margin + max(top, left)
+
+
+    def _crop(self, image, margin):
+        if self.letterbox is None:
+            return (0, 0, 0, 0)
+        top, bottom, left, right = self.letterbox.crop(image.shape)
+        if isinstance(image, BorderFrame):
+            # Until the capture grows to capture_margin, only sample as deep as the ring reaches.
+            limit = max(0, image.margin - margin)
+            top, bottom, left, right = (min(bar, limit) for bar in (top, bottom, left, right))
+        return (top, bottom, left, right)
+
+
+    def _get_sampling_plan(self, image):
+        h, w = image.shape[:2]
+        border_margin = image.margin if isinstance(image, BorderFrame) else None
+
+        if self.zone_layout is not None:
+            crop = self._crop(image, 0)
+            plan_key = ("zones", (h, w), border_margin, crop)
+            if self._sampling_plan is None or self._sampling_plan_key != plan_key:
+                self._sampling_plan = self.zone_layout.compile((h, w), border_margin, crop)
+                self._sampling_plan_key = plan_key
+            return self._sampling_plan
+
+        margin = max(1, round(self.margin / self._downscale_by))
+        margin = margin if border_margin is None else min(margin, border_margin)
+        # A downscaled frame is already cut from inside the bars.
+        crop = self._crop(image, margin) if self._downscale_by == 1 else (0, 0, 0, 0)
+        area_h, area_w = h - crop[0] - crop[1], w - crop[2] - crop[3]
+
+        # Margin check
+        requested_margin = margin
+        if margin * 2 >= min(area_w, area_h):
+            margin = max(1, min(area_w, area_h) // 4)
+
+        if self.order not in ORDERINGS:
+            logger.warning(f"Unknown order '{self.order}', defaulting to 'clockwise'.")
+            self.order = "clockwise"
+
+        if self.start_side not in ORDERINGS[self.order]:
+            logger.warning(f"Invalid start side '{self.start_side}', defaulting to 'bottom'.")
+            self.start_side = "bottom"
+
+        plan_key = (
+            tuple(sorted(self.led_config.items())),
+            margin,
+            self.order,
+            self.start_side,
+            self.enable_corners,
+            (h, w),
+            border_margin,
+            crop
+        )
+        if self._sampling_plan is None or self._sampling_plan_key != plan_key:
+            if margin != requested_margin:
+                logger.warning(f"Margin {requested_margin} is too large for image size {w}x{h}, using {margin}.")
+            self._sampling_plan = SamplingPlan(
+                led_config=self.led_config,
+                margin=margin,
+                order=self.order,
+                start_side=self.start_side,
+                enable_corners=self.enable_corners,
+                frame_shape=(h, w),
+                border_margin=border_margin,
+                crop=crop
+            )
+            self._sampling_plan_key = plan_key
+            logger.info(f"Sampling plan rebuilt for {w}x{h}: {self._sampling_plan.led_count} LEDs")
+
+        return self._sampling_plan
+
+
+    def _downscale_factor(self, h, w):
+        pixels_per_led = SAMPLING_QUALITY_PIXELS_PER_LED[self.sampling_quality]
+        if not pixels_per_led:
+            return 1
+
+        if self.zone_layout is not None:
+            # Zones already cap their samples per LED, and may lie inside the border ring.
+            return 1
+
+        spans = []
+        for side, count in self.led_config.items():
+            if count > 0:
+                length = w if side in ("top", "bottom") else h
+                spans.append(length / count)
+        if not spans:
+            return 1
+        return max(1, int(min(spans) / pixels_per_led))
+
+
+    def _downscale(self, image):
+        """
+        Shrink only the edge strips with INTER_AREA into a small BorderFrame,
+        sized so that each LED still covers about the configured number of pixels.
+        """
+        h, w = image.shape[:2]
+        factor = self._downscale_factor(h, w)
+        self._downscale_by = factor
+        if factor == 1:
+            return image
+
+        # The margin-deep strips are cut from the active area inside any letterbox
+        # bars, so the small frame needs no crop of its own.
+        top, bottom, left, right = self._crop(image, self.margin)
+        area_h, area_w = h - top - bottom, w - left - right
+        source_margin = max(1, min(self.margin, min(area_w, area_h) // 4))
+        source_strips = {}
+        for name, region_top, region_left, height, width, _ in BorderFrame.border_regions(area_h, area_w, source_margin):
+            row, col = top + region_top, left + region_left
+            if isinstance(image, BorderFrame):
+                source_strips[name] = self._border_region(image, name, row, col, height, width)
+            else:
+                source_strips[name] = image[row:row + height, col:col + width]
+
+        small_shape = (area_h // factor, area_w // factor)
+        small_margin = max(1, round(source_margin / factor))
+        small = self._downscaled_frame
+        if small is None or small.shape[:2] != small_shape or small.margin != small_margin:
+            small = self._downscaled_frame = BorderFrame(small_shape, small_margin)
+            logger.info(f"Sampling at 1/{factor} scale: {w}x{h} -> {small_shape[1]}x{small_shape[0]}, margin {small_margin}")
+
+        for name, _, _, height, width, _ in small.regions:
+            source = source_strips[name]
+            if height <= 0 or width <= 0 or source.size == 0:
+                continue
+            cv2.resize(source, (width, height), dst=small.strip(name), interpolation=cv2.INTER_AREA)
+
+        return small
+
+
+    def _border_region(self, image, name, row, col, height, width):
+        """
+        A rectangle of frame pixels read from a BorderFrame. A rectangle that
+        spans several strips (a side band between letterbox bars) is joined into
+        a cached buffer.
+        """
+        pieces = []
+        for strip_name, strip_top, strip_left, strip_height, strip_width, _ in image.regions:
+            first, last = max(row, strip_top), min(row + height, strip_top + strip_height)
+            if last <= first or col < strip_left or col + width > strip_left + strip_width:
+                continue
+            strip = image.strip(strip_name)
+            pieces.append((first, strip[first - strip_top:last - strip_top, col - strip_left:col - strip_left + width]))
+        if sum(len(piece) for _, piece in pieces) != height:
+            raise ValueError(f"Region {name} is outside the {image.margin}px border ring.")
+        if len(pieces) == 1:
+            return pieces[0][1]
+
+        buffer = self._side_strips.get(name)
+        if buffer is None or buffer.shape != (height, width, 3):
+            buffer = self._side_strips[name] = np.empty((height, width, 3), dtype=np.uint8)
+        np.concatenate([piece for _, piece in sorted(pieces, key=lambda item: item[0])], out=buffer)
+        return buffer
+
+
+    def _get_color_sampler(self, plan):
+        matrix = plan.matrix if isinstance(plan, SamplingPlan) else plan
+        if self._color_sampler is None or self._color_sampler.matrix is not matrix:
+            self._color_sampler = DominantColorSampler(matrix, self.color_mode)
+        return self._color_sampler
+
+
     def get_led_colors(self, image):
         if image is None:
             logger.warning("Input image is None!")
-            return []
-            
+            return np.zeros((0, 3), dtype=np.uint8)
+
         try:
-            h, w, _ = image.shape
-            logger.debug(f"Processing image of size: {w}x{h}")
-
-            # Margin check
-            if self.margin * 2 >= min(w, h):
-                logger.warning(f"Margin {self.margin} is too large for image size {w}x{h}, reducing margin.")
-                self.margin = min(w, h) // 4
-
-            corner_margin = 0
-            if self.enable_corners:
-                corner_margin = self.margin
-
-            colors = []
-
-            def gaussian_weighted_average(image_region, sigma=1.0, kernel_size=None):
-                
-                if image_region.size == 0:
-                    return np.array([0, 0, 0], dtype=np.uint8)
-                
-                try:
-                    h, w = image_region.shape[:2]
-                    
-                    if kernel_size is None:
-                        kernel_size = min(max(5, min(h, w) // 4), 15)
-                        kernel_size = kernel_size if kernel_size % 2 == 1 else kernel_size + 1
-                    
-                    center = kernel_size // 2
-                    kernel = np.zeros((kernel_size, kernel_size))
-                    
-                    for i in range(kernel_size):
-                        for j in range(kernel_size):
-                            x, y = i - center, j - center
-                            kernel[i, j] = math.exp(-(x*x + y*y) / (2 * sigma * sigma))
-                    
-                    kernel = kernel / np.sum(kernel)
-                    
-                    kernel_resized = cv2.resize(kernel, (w, h))
-                    
-                    weighted_sum = np.zeros(3)
-                    total_weight = np.sum(kernel_resized)
-                    
-                    for channel in range(3):  # R, G, B
-                        channel_data = image_region[:, :, channel].astype(np.float32)
-                        weighted_sum[channel] = np.sum(channel_data * kernel_resized)
-                    
-                    final_color = weighted_sum / total_weight
-                    
-                    return np.clip(final_color, 0, 255).astype(np.uint8)
-                    
-                except Exception as e:
-                    logger.error(f"Gaussian weighted average failed: {e}")
-                    return np.mean(image_region, axis=(0, 1)).astype(np.uint8)
-
-                    
-            def smart_segmentation(image_region, num_segments, overlap_ratio=0.1, blur_before_split=True):
-                if image_region.size == 0 or num_segments <= 0:
-                    return [np.zeros((1, 1, 3), dtype=np.uint8) for _ in range(num_segments)]
-                
-                try:
-                    h, w = image_region.shape[:2]
-                    
-                    if blur_before_split and h > 5 and w > 5:
-                        blur_size = max(3, min(h, w) // 10)
-                        if blur_size % 2 == 0:
-                            blur_size += 1
-                        region = cv2.GaussianBlur(image_region, (blur_size, blur_size), 0)
-                    else:
-                        region = image_region.copy()
-                    
-                    split_horizontally = w > h
-                    
-                    segments = []
-                    
-                    if split_horizontally:
-                        segment_width = w / num_segments
-                        overlap_pixels = int(segment_width * overlap_ratio)
-                        
-                        for i in range(num_segments):
-                            start = max(0, int(i * segment_width) - overlap_pixels)
-                            end = min(w, int((i + 1) * segment_width) + overlap_pixels)
-                            
-                            if i == 0:
-                                start = 0
-                            if i == num_segments - 1:
-                                end = w
-                            
-                            segment = region[:, start:end, :]
-                            segments.append(segment)
-                            
-                    else:
-                        segment_height = h / num_segments
-                        overlap_pixels = int(segment_height * overlap_ratio)
-                        
-                        for i in range(num_segments):
-                            start = max(0, int(i * segment_height) - overlap_pixels)
-                            end = min(h, int((i + 1) * segment_height) + overlap_pixels)
-                            
-                            if i == 0:
-                                start = 0
-                            if i == num_segments - 1:
-                                end = h
-                            
-                            segment = region[start:end, :, :]
-                            segments.append(segment)
-                    
-                    valid_segments = []
-                    for i, segment in enumerate(segments):
-                        if segment.size > 0:
-                            valid_segments.append(segment)
-                    return valid_segments
-                    
-                except Exception as e:
-                    logger.error(f"Smart segmentation failed: {e}")
-                    axis = 1 if image_region.shape[1] > image_region.shape[0] else 0
-                    return np.array_split(image_region, num_segments, axis=axis)
-
-            # Extract regions with bounds checking
-            try:
-                top_region = image[0:self.margin, corner_margin:w-corner_margin, :]
-                bottom_region = image[h-self.margin:h, corner_margin:w-corner_margin, :]
-                left_region = image[corner_margin:h-corner_margin, 0:self.margin, :]
-                right_region = image[corner_margin:h-corner_margin, w-self.margin:w, :]
-                
-                logger.debug(f"Regions extracted: top={top_region.shape}, right={right_region.shape}, bottom={bottom_region.shape}, left={left_region.shape}")
-                
-            except Exception as e:
-                logger.error(f"Failed to extract image regions: {e}")
-                return []
-
-            # Process each side
-            try:
-                top_leds = [gaussian_weighted_average(r) for r in smart_segmentation(top_region, self.led_config['top'])]
-                right_leds = [gaussian_weighted_average(r) for r in smart_segmentation(right_region, self.led_config['right'])]
-                bottom_leds = [gaussian_weighted_average(r) for r in smart_segmentation(np.fliplr(bottom_region), self.led_config['bottom'])]
-                left_leds = [gaussian_weighted_average(r) for r in smart_segmentation(np.flipud(left_region), self.led_config['left'])]
-                
-                logger.debug(f"LED segments computed: top={len(top_leds)}, right={len(right_leds)}, bottom={len(bottom_leds)}, left={len(left_leds)}")
-            except Exception as e:
-                logger.error(f"LED segment processing failed: {e}")
-                return []
-
-            sides = {
-                "top": top_leds,
-                "right": right_leds,
-                "bottom": bottom_leds,
-                "left": left_leds,
-            }
-
-            # Build final order
-            orderings = {
-                "clockwise": ["bottom", "right", "top", "left"],
-                "counterclockwise": ["bottom", "left", "top", "right"]
-            }
-
-            if self.order not in orderings:
-                logger.warning(f"Unknown order '{self.order}', defaulting to 'clockwise'.")
-                self.order = "clockwise"
-                
-            if self.start_side not in orderings[self.order]:
-                logger.warning(f"Invalid start side '{self.start_side}', defaulting to 'bottom'.")
-                self.start_side = "bottom"
-
-            start_index = orderings[self.order].index(self.start_side)
-            final_order = orderings[self.order][start_index:] + orderings[self.order][:start_index]
-
-            # Combine colors
-            for side in final_order:
-                colors.extend(sides[side])
-
-            color_arrays = []
-            for color in colors:
-                if isinstance(color, np.ndarray):
-                    color_arrays.append(color.astype(np.uint8))
-                else:
-                    color_arrays.append(np.array([0, 0, 0], dtype=np.uint8))  # Fallback
-
-            logger.info(f"{len(color_arrays)} LED colors generated successfully.")
-            logger.debug(f"First few LED colors: {color_arrays[:3]}")
-            
-            return color_arrays
-            
+            self._frame_shape = image.shape[:2]
+            if self.letterbox is not None:
+                self.letterbox.update(image)
+            image = self._downscale(image)
+            plan = self._get_sampling_plan(image)
+            if self.color_mode == "mean":
+                colors = plan.apply(image)
+            else:
+                colors = self._get_color_sampler(plan).apply(image)
+
+            logger.debug(f"{len(colors)} LED colors generated. First few: {colors[:3].tolist()}")
+            return colors
+
         except Exception as e:
             logger.critical(f"Fatal error during LED color computation: {e}", exc_info=True)
-            return []
+            return np.zeros((0, 3), dtype=np.uint8)
         
 
     def adjust_and_correct_colors(self, colors, brightness=1.0, min_brightness_clip=28):
-        corrected = []
-
-        for color in colors:
-            try:
-                
-                r = color[0] * brightness  * self.coef_r 
-                g = color[1] * brightness  * self.coef_g
-                b = color[2] * brightness  * self.coef_b
-                scaled = np.array([r, g, b], dtype=np.float32)
-                rgb = np.uint8([[scaled]])  
-                hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)[0][0]
-                brightness_value = hsv[2] 
-
-                if brightness_value < min_brightness_clip:
-                    corrected.append((0, 0, 0)) 
-                    continue
+        """
+        Apply brightness, white balance, the brightness cutoff and gamma to all LEDs at once.
+        Returns a contiguous (N, 3) uint8 array ready to be sent to the device.
+        """
+        try:
+            colors = np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+            gains = np.array([self.coef_r, self.coef_g, self.coef_b], dtype=np.float32) * brightness
+            # Until a rebuilt table is swapped in, colors are computed directly.
+            if self.color_lut is not None and self.color_lut.update(gains, min_brightness_clip):
+                return self.color_lut.apply(colors)
 
-                scale_range = 255 - min_brightness_clip
-                adjusted = (scaled - min_brightness_clip) / scale_range * 255
-                adjusted = np.clip(adjusted, 0, 255).astype(np.uint8)
+            scaled = colors * gains
+            if self.color_matrix is not None:
+                scaled = scaled @ self.color_matrix.T
 
-                final = self.gamma_table[adjusted]
-                corrected.append(tuple(final))
+            # HSV value is the max channel of the 8-bit color
+            value = np.clip(scaled, 0, 255).astype(np.uint8).max(axis=1)
+            too_dark = value < min_brightness_clip
 
-            except Exception as e:
-                logger.error(f"Color correction failed: {e}")
-                corrected.append((0, 0, 0))
+            scale_range = max(1, 255 - min_brightness_clip)
+            adjusted = (scaled - min_brightness_clip) * (255.0 / scale_range)
+            adjusted = np.clip(adjusted, 0, 255).astype(np.uint8)
 
-        return corrected
+            corrected = self.gamma_table[adjusted]
+            corrected[too_dark] = 0
+            return np.ascontiguousarray(corrected)
 
+        except Exception as e:
+            logger.error(f"Color correction failed: {e}")
+            return np.zeros((len(colors), 3), dtype=np.uint8)
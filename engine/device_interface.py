@@ -1,17 +1,38 @@
+import collections
 import time
 import serial
 import json
 import os
+import re
 import struct
 import subprocess
 import threading
+import numpy as np
+from engine.frame_interpolator import FrameInterpolator
+from engine.frame_mailbox import TimedFrame
+from engine.output_config import led_count, output_config
 from tools.logger import setup_logger
 
 CONFIG_STRUCT_FORMAT = "<BBIBB"
+SERIAL_BITS_PER_BYTE = 10  # 8N1: start + 8 data + stop
+LED_SHOW_SECONDS_PER_LED = 30e-6  # WS2812B: 24 bits at 1.25 us
+LED_LATCH_SECONDS = 50e-6
+DELTA_KEYFRAME_INTERVAL = 60  # full frames are re-sent at least this often
+DELTA_MAX_LEDS = 255  # ranges use one byte for start and length
+MAX_FRAMES_IN_FLIGHT = 2  # frames written but not yet answered with OK/ERROR
+ACK_TIMEOUT = 0.25  # seconds to wait for a reply before assuming it was lost
+PORT_RETRY_INTERVAL = 0.25  # seconds between attempts to open a busy or missing port
+BOARD_PROBE_INTERVAL = 0.5  # seconds between 't' probes while waiting for READY/ALIVE
+QUICK_PROBE_TIMEOUT = 0.5  # seconds an already open port gets to answer before it is reopened
+RECONNECT_AFTER_FAILURES = 3  # consecutive failed writes before the writer reconnects
+RECONNECT_BACKOFF = 2.0  # minimum seconds between background reconnect attempts
+# Replies to a dropped frame: "ERROR: <read>/<expected>" for 'd', "ERROR: Delta ..." for 'c'.
+# Other errors (config, EEPROM) are not frame replies.
+FRAME_ERROR_PATTERN = re.compile(r"ERROR: (\d+/\d+|Delta .*)$")
 logger = setup_logger("DeviceInterface")
 
 class DeviceInterface:
-    def __init__(self, port, baudrate, led_pin, update_rate, version, timeout=1, write_timeout=0.5):
+    def __init__(self, port, baudrate, led_pin, update_rate, version, timeout=1, write_timeout=0.5, frame_compression="none", interpolation="none"):
         self.port = port
         self.baudrate = baudrate
         self.led_pin = led_pin
@@ -26,39 +47,69 @@ class DeviceInterface:
         self.connection_stable = False
         self.should_write = False
         self.write_thread = None
+        self._frame_buffer = None
+        self._frame_view = None
+        self._link_free_at = 0.0
+        self.frame_compression = frame_compression
+        self.interpolation = interpolation
+        self.output_name = None  # which entry of config["outputs"] this device drives
+        self.device_features = set()  # optional commands the sketch lists after ALIVE, e.g. "delta"
+        self._device_frame = None
+        self._frames_since_keyframe = 0
+        self._force_keyframe = False
+        self._ack_condition = threading.Condition()
+        self._frames_in_flight = 0
+        self.frames_acked = 0
+        self.frames_failed = 0
+        self.ack_timeouts = 0
+        self._line_subscribers = []
+        self._subscribers_lock = threading.Lock()
+        self.stats = None  # optional PipelineStats: serial_write, ack and glass_to_led
+        self._sent_frames = collections.deque()  # (sent_at, captured_at) per frame in flight
 
 
     @classmethod
-    def from_config(cls, config_path="config/config.json"):
+    def from_config(cls, config_path="config/config.json", output_name=None):
         with open(config_path) as f:
             config = json.load(f)
+        return cls.from_dict(output_config(config, output_name))
 
+
+    @classmethod
+    def from_dict(cls, config):
         port = config.get("serial_port", "COM5")
         baudrate = config.get("baud_rate", 115200)
         led_pin = config.get("led_pin", 7)
         update_rate = config.get("update_rate_hz", 30)
         version = config.get("version", 1)
-        instance = cls(port=port, baudrate=baudrate, led_pin=led_pin, update_rate=update_rate, version=version)
-        instance.expected_led_count = sum(config.get("led_config", {}).values())
+        frame_compression = config.get("frame_compression", "none")
+        interpolation = config.get("interpolation", "none")
+        instance = cls(port=port, baudrate=baudrate, led_pin=led_pin, update_rate=update_rate, version=version, frame_compression=frame_compression, interpolation=interpolation)
+        instance.expected_led_count = led_count(config)
+        instance.output_name = config.get("name")
         return instance
     
 
     def update_self(self, config_path="config/config.json"):
         with open(config_path) as f:
-            config = json.load(f)
+            config = output_config(json.load(f), self.output_name)
 
         self.port = config.get("serial_port", self.port)
         self.baudrate = config.get("baud_rate", self.baudrate)
         self.led_pin = config.get("led_pin", self.led_pin)
         self.update_rate = config.get("update_rate_hz", self.update_rate)
         self.version = config.get("version", self.version)
-        self.expected_led_count = sum(config.get("led_config", {}).values())
+        self.frame_compression = config.get("frame_compression", self.frame_compression)
+        self.interpolation = config.get("interpolation", self.interpolation)
+        self.expected_led_count = led_count(config)
 
 
 
     def start_reading_arduino_output(self):
         if not self.serial or not self.serial.is_open:
             return
+        if self.read_thread and self.read_thread.is_alive():
+            return
         self.should_read = True
         self.read_thread = threading.Thread(target=self._read_arduino_messages, daemon=True)
         self.read_thread.start()
@@ -67,54 +118,207 @@ class DeviceInterface:
 
     def stop_reading_arduino_output(self):
             self.should_read = False
+            if self.serial and hasattr(self.serial, "cancel_read"):
+                try:
+                    self.serial.cancel_read()
+                except Exception:
+                    pass
             if self.read_thread and self.read_thread.is_alive():
                 self.read_thread.join(timeout=2)
             logger.info("Stopped reading Arduino output.")
 
+
+    def subscribe(self, callback):
+        """
+        Register callback(line) to be called from the reader thread for every line the device sends.
+        """
+        with self._subscribers_lock:
+            self._line_subscribers.append(callback)
+        return callback
+
+
+    def unsubscribe(self, callback):
+        with self._subscribers_lock:
+            if callback in self._line_subscribers:
+                self._line_subscribers.remove(callback)
+
+
+    def _wait_for_line(self, predicate, timeout, send=None):
+        """
+        Optionally write `send`, then block until the device sends a line matching predicate.
+        Returns the line, or None on timeout.
+        """
+        self.start_reading_arduino_output()
+        matched = []
+        received = threading.Event()
+
+        def on_line(line):
+            if not matched and predicate(line):
+                matched.append(line)
+                received.set()
+
+        self.subscribe(on_line)
+        try:
+            if send:
+                self.serial.write(send)
+            received.wait(timeout)
+        finally:
+            self.unsubscribe(on_line)
+        return matched[0] if matched else None
+
             
     def _read_arduino_messages(self):
-        buffer = ""
+        buffer = b""
         while self.should_read and self.serial and self.serial.is_open:
             try:
-                if self.serial.in_waiting > 0:
-                    data = self.serial.read(self.serial.in_waiting).decode('utf-8', errors='ignore')
-                    buffer += data
-                    while '\n' in buffer:
-                        line, buffer = buffer.split('\n', 1)
-                        line = line.strip()
-                        if line:
-                            if line in ["READY", "ALIVE"] or line.startswith("ERR") or line.startswith("BRIGHTNESS"):
-                                logger.info(f"[Arduino] {line}")
-                            elif "Expected LEDs" in line or "Baud Rate" in line:
-                                logger.info(f"[Arduino] {line}")
-                            else:
-                                logger.debug(f"[Arduino] {line}")
-                time.sleep(0.05)
+                # Blocks until at least one byte arrives or the port timeout expires.
+                data = self.serial.read(max(1, self.serial.in_waiting))
+                if not data:
+                    continue
+                buffer += data
+                while b'\n' in buffer:
+                    line, buffer = buffer.split(b'\n', 1)
+                    line = line.decode('utf-8', errors='ignore').strip()
+                    if line:
+                        self._dispatch_line(line)
             except Exception as e:
                 if self.should_read:
                     logger.error(f"Arduino read error: {e}")
                 break
 
 
+    def _dispatch_line(self, line):
+        if line == "OK" or FRAME_ERROR_PATTERN.match(line):
+            self._on_frame_reply(line == "OK")
+        if line.startswith("ALIVE"):
+            self.device_features = set(line.split()[1:])
+
+        if line == "READY" or line.startswith("ALIVE") or line.startswith("ERR") or line.startswith("BRIGHTNESS"):
+            logger.info(f"[Arduino] {line}")
+        elif "Expected LEDs" in line or "Baud Rate" in line:
+            logger.info(f"[Arduino] {line}")
+        elif line != "OK":
+            logger.debug(f"[Arduino] {line}")
+
+        with self._subscribers_lock:
+            subscribers = list(self._line_subscribers)
+        for callback in subscribers:
+            try:
+                callback(line)
+            except Exception as e:
+                logger.error(f"Line subscriber error: {e}")
+
+
+    def _flow_control_active(self):
+        return self.read_thread is not None and self.read_thread.is_alive()
+
+
+    def _on_frame_reply(self, ok):
+        replied_at = time.perf_counter()
+        with self._ack_condition:
+            sent = self._sent_frames.popleft() if self._sent_frames else None
+            if ok:
+                self.frames_acked += 1
+                if sent and self.stats:
+                    sent_at, captured_at = sent
+                    self.stats.record("ack", replied_at - sent_at)
+                    if captured_at is not None:
+                        self.stats.record("glass_to_led", replied_at - captured_at)
+            else:
+                self.frames_failed += 1
+                # The device dropped a frame, so its LEDs no longer match our copy.
+                self._force_keyframe = True
+            self._frames_in_flight = max(0, self._frames_in_flight - 1)
+            self._ack_condition.notify_all()
+
+
+    def reset_flow_control(self):
+        with self._ack_condition:
+            self._frames_in_flight = 0
+            self._sent_frames.clear()
+            self._ack_condition.notify_all()
+
+
+    def wait_for_frame_slot(self, timeout=ACK_TIMEOUT):
+        """
+        Block until fewer than MAX_FRAMES_IN_FLIGHT frames are unanswered.
+        If no reply arrives in time the outstanding frames are written off.
+        """
+        with self._ack_condition:
+            if self._ack_condition.wait_for(lambda: self._frames_in_flight < MAX_FRAMES_IN_FLIGHT, timeout=timeout):
+                return True
+            logger.debug(f"No reply for {self._frames_in_flight} frame(s) within {timeout:.2f}s, resetting flow control.")
+            self.ack_timeouts += 1
+            self._frames_in_flight = 0
+            self._sent_frames.clear()
+            self._force_keyframe = True
+            return False
+
+
     def start_writing_loop(self, color_generator, interval=0.1):
+        """
+        Send frames from color_generator. While the reader thread is running,
+        a new frame is only taken from the generator once the device has a free
+        slot, so frames are never queued behind the link and stale ones are
+        dropped upstream. interval is the minimum time between sends.
+        The generator may yield plain colors, a TimedFrame(colors, captured_at),
+        or None when it has no new frame yet. With interpolation enabled the
+        writer fills those gaps with frames blended from the last two it got,
+        so interval can be much shorter than the capture period.
+        """
         if not self.serial or not self.serial.is_open:
             logger.error("Cannot start writer loop: serial not open.")
             return
 
+        interpolator = None
+        if self.interpolation != "none":
+            interpolator = FrameInterpolator(self.interpolation)
+
         def writer_loop():
-            logger.info("Writer loop started.")
+            logger.info(f"Writer loop started (interpolation: {self.interpolation}).")
+            next_send = time.perf_counter()
+            failed_writes = 0
+            last_reconnect = 0.0
             while self.should_write:
                 try:
+                    if self._flow_control_active():
+                        self.wait_for_frame_slot()
                     colors = next(color_generator)
-                    self.send_colors(colors)
+                    captured_at = None
+                    if isinstance(colors, TimedFrame):
+                        colors, captured_at = colors
+
+                    if interpolator:
+                        now = time.perf_counter()
+                        if colors is not None:
+                            interpolator.push(colors, now, captured_at)
+                        colors = interpolator.sample(now)
+                        captured_at = interpolator.captured_at
+                    if colors is None:
+                        continue
+
+                    if self.send_colors(colors, captured_at=captured_at):
+                        failed_writes = 0
+                    else:
+                        failed_writes += 1
+                        if failed_writes >= RECONNECT_AFTER_FAILURES and time.monotonic() - last_reconnect >= RECONNECT_BACKOFF:
+                            logger.warning(f"{failed_writes} writes failed, reconnecting...")
+                            last_reconnect = time.monotonic()
+                            if self.connect(max_wait=RECONNECT_BACKOFF):
+                                failed_writes = 0
                 except StopIteration:
                     logger.info("Color generator exhausted. Exiting writer loop.")
                     break
                 except Exception as e:
                     logger.error(f"Writer error: {e}")
-                time.sleep(interval)
+
+                next_send = max(next_send + interval, time.perf_counter() - interval)
+                sleep_time = next_send - time.perf_counter()
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
             logger.info("Writer loop ended.")
 
+        self.reset_flow_control()
         self.should_write = True
         self.write_thread = threading.Thread(target=writer_loop, daemon=True)
         self.write_thread.start()
@@ -126,35 +330,154 @@ class DeviceInterface:
             self.write_thread.join(timeout=2)
             
 
-    def send_colors(self, led_colors):
+    def _frame_payload(self, led_colors):
+        if isinstance(led_colors, (bytes, bytearray, memoryview)):
+            return np.frombuffer(led_colors, dtype=np.uint8)
+
+        colors = np.asarray(led_colors)
+        if colors.dtype != np.uint8:
+            colors = np.clip(colors, 0, 255).astype(np.uint8)
+        return colors.reshape(-1)
+
+
+    def _wait_for_link(self, frame_bytes, led_count):
+        """
+        Block until the previous frame has been clocked out and shown,
+        then reserve the link for this frame.
+        """
+        now = time.perf_counter()
+        if now < self._link_free_at:
+            time.sleep(self._link_free_at - now)
+            now = time.perf_counter()
+
+        wire_time = frame_bytes * SERIAL_BITS_PER_BYTE / self.baudrate
+        show_time = led_count * LED_SHOW_SECONDS_PER_LED + LED_LATCH_SECONDS
+        self._link_free_at = now + wire_time + show_time
+
+
+    def _encode_full_frame(self, payload):
+        if self._frame_buffer is None or len(self._frame_buffer) != payload.size + 1:
+            self._frame_buffer = bytearray(payload.size + 1)
+            self._frame_buffer[0] = ord('d')  # Header
+            self._frame_view = np.frombuffer(self._frame_buffer, dtype=np.uint8)[1:]
+        self._frame_view[:] = payload
+        return self._frame_buffer
+
+
+    def _encode_delta_frame(self, payload):
+        """
+        Encode only the LED ranges that differ from what the device shows as a 'c' frame.
+        Returns None when a full frame is due or would not be larger.
+        """
+        previous = self._device_frame
+        led_count = payload.size // 3
+        if (previous is None or previous.size != payload.size or led_count > DELTA_MAX_LEDS
+                or self._force_keyframe or self._frames_since_keyframe >= DELTA_KEYFRAME_INTERVAL):
+            return None
+
+        changed = np.any(payload.reshape(-1, 3) != previous.reshape(-1, 3), axis=1)
+        edges = np.flatnonzero(np.diff(np.concatenate(([False], changed, [False])).astype(np.int8)))
+        starts, ends = edges[::2], edges[1::2]
+
+        encoded_size = 2 + 2 * len(starts) + 3 * int(changed.sum())
+        if encoded_size >= payload.size + 1 or len(starts) > 255:
+            return None
+
+        frame = bytearray(encoded_size)
+        frame[0] = ord('c')  # Header
+        frame[1] = len(starts)
+        position = 2
+        for start, end in zip(starts, ends):
+            frame[position] = start
+            frame[position + 1] = end - start
+            frame[position + 2:position + 2 + (end - start) * 3] = payload[start * 3:end * 3].tobytes()
+            position += 2 + (end - start) * 3
+        return frame
+
+
+    def send_colors(self, led_colors, captured_at=None):
+        """
+        Send one frame. Accepts an (N, 3) array, a sequence of (r, g, b)
+        or any buffer of N * 3 bytes, and writes header and payload in one call.
+        With frame_compression set to "delta" and a sketch that lists delta
+        frames in its ALIVE reply, only changed LED ranges are sent when that
+        is smaller than a full 'd' frame. captured_at (perf_counter)
+        is only used for the glass_to_led latency in self.stats.
+        """
         if not self.serial or not self.serial.is_open:
             logger.error("Serial connection is not open.")
             return False
 
+        reservation = None
         try:
-            if self.expected_led_count and len(led_colors) != self.expected_led_count:
-                logger.warning(f"Expected {self.expected_led_count} LEDs, but received {len(led_colors)}.")
-
-            data = bytearray()
-            data.append(ord('d'))  # Header
-            
-            for r, g, b in led_colors:
-                r = max(0, min(255, int(r)))
-                g = max(0, min(255, int(g)))
-                b = max(0, min(255, int(b)))
-                data += bytes([r, g, b])
-
-            self.serial.write(data)
-            self.serial.flush()
-
-            time.sleep(0.01)
+            payload = self._frame_payload(led_colors)
+            led_count = payload.size // 3
+
+            if self.expected_led_count and led_count != self.expected_led_count:
+                logger.warning(f"Expected {self.expected_led_count} LEDs, but received {led_count}.")
+
+            # 'c' frames are only sent to sketches that listed them; older ones would
+            # read the payload as commands.
+            delta = self.frame_compression == "delta" and "delta" in self.device_features
+            frame = None
+            if delta:
+                frame = self._encode_delta_frame(payload)
+            if frame is None:
+                frame = self._encode_full_frame(payload)
+
+            self._wait_for_link(len(frame), led_count)
+            write_start = time.perf_counter()
+            if self._flow_control_active():
+                # Take the slot before writing: the reply can arrive before write() returns.
+                reservation = [write_start, captured_at]
+                with self._ack_condition:
+                    self._frames_in_flight += 1
+                    self._sent_frames.append(reservation)
+            self.serial.write(frame)
+            sent_at = time.perf_counter()
+            if reservation is not None:
+                reservation[0] = sent_at
+            elif self.stats and captured_at is not None:
+                # No replies to wait for; the write is as close to the LEDs as we can see.
+                self.stats.record("glass_to_led", sent_at - captured_at)
+            if self.stats:
+                self.stats.record("serial_write", sent_at - write_start)
+
+            if delta:
+                self._remember_device_frame(payload, keyframe=frame[0] == ord('d'))
             return True
             
         except Exception as e:
             logger.error(f"Data transmission error: {e}")
+            self._force_keyframe = True
+            self._release_reservation(reservation)
             return False
 
 
+    def _release_reservation(self, reservation):
+        # Give back the slot of a frame whose write failed, unless a reply already took it.
+        if reservation is None:
+            return
+        with self._ack_condition:
+            for index, entry in enumerate(self._sent_frames):
+                if entry is reservation:
+                    del self._sent_frames[index]
+                    self._frames_in_flight = max(0, self._frames_in_flight - 1)
+                    self._ack_condition.notify_all()
+                    break
+
+
+    def _remember_device_frame(self, payload, keyframe):
+        if self._device_frame is None or self._device_frame.size != payload.size:
+            self._device_frame = np.empty_like(payload)
+        np.copyto(self._device_frame, payload)
+        if keyframe:
+            self._force_keyframe = False
+            self._frames_since_keyframe = 0
+        else:
+            self._frames_since_keyframe += 1
+
+
     def send_config(self):
         if not self.serial or not self.serial.is_open:
                 logger.error("Serial not open during config send.")
@@ -172,100 +495,108 @@ class DeviceInterface:
                 self.version
             )
 
-            self.serial.write(b'w')
-            self.serial.write(config_bytes)
-            self.serial.flush()
-
-            response = self.serial.readline().decode(errors="ignore").strip()
+            response = self._wait_for_line(
+                lambda line: "CONFIG_SAVED" in line or line.startswith("ERROR"),
+                timeout=self.timeout + 1,
+                send=b'w' + config_bytes
+            )
             logger.info(f"[Arduino]: {response}")
-            return "CONFIG_SAVED" in response
+            return response is not None and "CONFIG_SAVED" in response
         except Exception as e:
             logger.error(f"Failed to send config: {e}")
             return False
 
 
-    def send_test_colors(self):
-        logger.info("Sending test colors...")
-        colors = {
-            "red": [(255, 0, 0)],
-            "green": [(0, 255, 0)],
-            "blue": [(0, 0, 255)],
-            "off": [(0, 0, 0)]
-        }
-        for color_name, color in colors.items():
-            self.send_colors(color * (self.expected_led_count or 10))
-            logger.debug(f"{color_name.capitalize()} color sent.")
-            time.sleep(1)
-        logger.info("Test colors completed.")
-
-
-    def connect(self, max_wait=5):
-        def wait_for_port(port, timeout=5):
-            start = time.time()
-            while time.time() - start < timeout:
-                try:
-                    s = serial.Serial(port, timeout=0.1)
-                    s.close()
-                    return True
-                except serial.SerialException:
-                    time.sleep(0.5)
-            return False
-        
-        def wait_for_ready(timeout=10):
-            buffer = ""
-            start_time = time.time()
-            ready_received = False
-            while time.time() - start_time < timeout:
-                if self.serial.in_waiting:
-                    data = self.serial.read(self.serial.in_waiting).decode('utf-8', errors='ignore')
-                    buffer += data
-                    if "READY" in buffer and not ready_received:
-                        logger.info("Arduino ready message received.")
-                        ready_received = True
-                        return True
-                time.sleep(0.1)
-            logger.warning(f"Timeout waiting for Arduino READY message. Buffer: {buffer[-100:]}")
+    def _open_port(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                # serial_for_url also accepts plain port names like COM6
+                self.serial = serial.serial_for_url(self.port, do_not_open=True)
+                self.serial.baudrate = self.baudrate
+                self.serial.timeout = self.timeout
+                self.serial.write_timeout = self.write_timeout
+                self.serial.dtr = False 
+                self.serial.rts = False
+                self.serial.open()
+                self.serial.reset_input_buffer()
+                self.serial.reset_output_buffer()
+                self.device_features = set()
+                logger.info(f"Serial port {self.port} opened successfully.")
+                return True
+            except serial.SerialException as e:
+                self.serial = None
+                if time.monotonic() >= deadline:
+                    logger.error(f"Port {self.port} not available after {timeout} seconds: {e}")
+                    return False
+                time.sleep(PORT_RETRY_INTERVAL)
+
+
+    def _close_port(self):
+        self.stop_reading_arduino_output()
+        if self.serial:
+            try:
+                self.serial.close()
+            except Exception as e:
+                logger.debug(f"Error closing serial port: {e}")
+        self.serial = None
+
+
+    def _probe_alive(self, timeout):
+        try:
+            return self._wait_for_line(lambda line: "ALIVE" in line, timeout, send=b't') is not None
+        except Exception as e:
+            logger.debug(f"Probe failed: {e}")
             return False
 
+
+    def _wait_for_board(self, timeout):
+        """
+        Wait for READY (the board reset when the port opened) or ALIVE (it was
+        already running), probing with 't' so neither case waits longer than needed.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            remaining = deadline - time.monotonic()
+            line = self._wait_for_line(
+                lambda line: line == "READY" or line.startswith("ALIVE"),
+                timeout=min(BOARD_PROBE_INTERVAL, remaining),
+                send=b't'
+            )
+            if line is not None:
+                logger.info(f"Arduino answered with {line}.")
+                return True
+        return False
+
+
+    def connect(self, max_wait=5, ready_timeout=10):
+        """
+        Connect to the board, returning as soon as it answers.
+        An already open port is kept if the board still replies to 't'.
+        """
         try:
             if self.serial and self.serial.is_open:
+                self.start_reading_arduino_output()
+                if self._probe_alive(QUICK_PROBE_TIMEOUT):
+                    logger.info("Existing serial connection is alive, keeping it.")
+                    self._connection_ready()
+                    return True
                 logger.info("Closing existing serial connection...")
-                self.stop_reading_arduino_output()
-                self.serial.close()
-                time.sleep(1)
-                
-            logger.info(f"Waiting for port {self.port} to become available...")
-            if not wait_for_port(self.port, timeout=max_wait):
-                logger.error(f"Port {self.port} not available after {max_wait} seconds.")
-                return False
+                self._close_port()
 
-            self.serial = serial.Serial()
-            self.serial.port = self.port
-            self.serial.baudrate = self.baudrate
-            self.serial.timeout = self.timeout
-            self.serial.write_timeout = self.write_timeout
-            self.serial.dtr = False 
-            self.serial.rts = False
-            self.serial.open()
-            logger.info(f"Serial port {self.port} opened successfully.")
-            time.sleep(3)
-            
-            self.serial.reset_input_buffer()
-            self.serial.reset_output_buffer()
-
-            if not wait_for_ready(timeout=10):
-                logger.error("Arduino did not send READY message.")
+            logger.info(f"Opening port {self.port}...")
+            if not self._open_port(timeout=max_wait):
                 return False
 
             self.start_reading_arduino_output()
-            time.sleep(0.5)
-
-            if not self.check_arduino_health():
-                logger.error("Arduino health check failed after connection.")
+            if not self._wait_for_board(timeout=ready_timeout):
+                logger.error("Arduino did not send READY or ALIVE.")
+                self._close_port()
+                self.connection_stable = False
                 return False
-            self.connection_stable = True
+
+            self._connection_ready()
             logger.info("Arduino communication established successfully.")
-            #self.send_test_colors()
             return True
 
         except Exception as e:
@@ -274,6 +605,23 @@ class DeviceInterface:
             return False
 
 
+    def _connection_ready(self):
+        self.connection_stable = True
+        self._link_free_at = 0.0
+        self._force_keyframe = True
+        self.reset_flow_control()
+        self._check_delta_support()
+
+
+    def _check_delta_support(self):
+        if self.frame_compression != "delta" or "delta" in self.device_features:
+            return
+        # A board that answered READY has not listed its commands yet.
+        self._probe_alive(QUICK_PROBE_TIMEOUT)
+        if "delta" not in self.device_features:
+            logger.warning("The sketch on the board does not support delta frames, sending full frames. Upload the current sketch to use them.")
+
+
     def close_leds(self):
         off_colors = [(0,0,0)] * (self.expected_led_count or 1)
         self.send_colors(off_colors)
@@ -293,42 +641,11 @@ class DeviceInterface:
             logger.info("Serial port closed.")
 
 
-    def check_arduino_health(self):
-        if not self.serial or not self.serial.is_open:
-            return False
-        try:
-            self.serial.reset_input_buffer()
-            
-            self.serial.write(b't')
-            self.serial.flush()
-            
-            start_time = time.time()
-            buffer = ""
-            while time.time() - start_time < 3:
-                if self.serial.in_waiting:
-                    data = self.serial.read(self.serial.in_waiting).decode('utf-8', errors='ignore')
-                    buffer += data
-                    if "ALIVE" in buffer:
-                        logger.debug("Arduino health check passed.")
-                        return True
-                time.sleep(0.1)
-            
-            logger.warning(f"Arduino health check timeout. Received: '{buffer.strip()}'")
-            if "READY" in buffer or len(buffer.strip()) == 0:
-                logger.info("Arduino seems ready despite health check timeout.")
-                return True
-            return False
-        except Exception as e:
-            logger.error(f"Arduino health check failed: {e}")
-            return False
-
-
     def generate_ino(self, config_path="config/config.json", template_path="arduino/arduino_template.tmpl", output_dir="arduino"):
         with open(config_path) as f:
-            config = json.load(f)
+            config = output_config(json.load(f), self.output_name)
 
-        led_config = config["led_config"]
-        num_leds = sum(led_config.values())
+        num_leds = led_count(config)
         led_pin = config.get("led_pin", 7)
         baud = config.get("baud_rate", 115200)
 
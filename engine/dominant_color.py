@@ -0,0 +1,102 @@
+import numpy as np
+from engine.border_frame import BorderFrame
+from tools.logger import setup_logger
+
+logger = setup_logger("DominantColor")
+
+COLOR_MODES = ("mean", "dominant", "saturated")
+HISTOGRAM_BITS = 3  # per channel: 8 x 8 x 8 = 512 bins per LED
+SATURATION_FLOOR = 0.15  # score weight of a fully gray bin in "saturated" mode
+MAX_HISTOGRAM_SAMPLES = 256  # pixels per LED that feed its histogram
+DARK_VALUE = 24  # in "saturated" mode, bins darker than this are scored down like gray ones
+
+
+class DominantColorSampler:
+    """
+    Picks one representative color per LED from a quantized color histogram
+    of the LED's pixels, instead of their weighted mean.
+
+        dominant   the most common color (weighted by the sampling weights)
+        saturated  the most common color, with vivid bins favored over gray
+                   and dark ones
+
+    Works on the same SparseWeights matrix as the mean path, thinned to at most
+    MAX_HISTOGRAM_SAMPLES evenly spread pixels per LED. The per-LED histogram
+    slot of every sample is precomputed, so a frame costs one gather, one
+    quantization and a few bincounts.
+    The returned color is the weighted mean of the pixels in the winning bin.
+    """
+
+    def __init__(self, matrix, mode="dominant", bits=HISTOGRAM_BITS):
+        if mode not in COLOR_MODES or mode == "mean":
+            logger.warning(f"Unknown histogram mode '{mode}', using 'dominant'.")
+            mode = "dominant"
+        self.matrix = matrix
+        self.mode = mode
+        self.bits = bits
+        self.bins = 1 << (3 * bits)
+
+        row_lengths = np.diff(matrix.indptr)
+        rows = np.repeat(np.arange(matrix.led_count, dtype=np.intp), row_lengths)
+        position = np.arange(matrix.nnz) - matrix.indptr[rows]
+        stride = np.maximum(1, -(-row_lengths // MAX_HISTOGRAM_SAMPLES))
+        keep = position % stride[rows] == 0
+
+        self._rows = rows[keep]
+        self._indices = matrix.indices[keep]
+        self._weights = matrix.weights[keep].astype(np.float64)
+        self._slot_base = self._rows * self.bins
+        self._samples = np.empty((len(self._indices), 3), dtype=np.uint8)
+        self._keys = np.empty(len(self._indices), dtype=np.intp)
+        self._channel = np.empty(len(self._indices), dtype=np.intp)
+
+        # Score multiplier per bin, from the color at the bin's center.
+        levels = (np.arange(1 << bits) + 0.5) * (256 >> bits)
+        r, g, b = np.meshgrid(levels, levels, levels, indexing="ij")
+        centers = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+        value = centers.max(axis=1)
+        saturation = (value - centers.min(axis=1)) / value
+        if mode == "saturated":
+            self._bin_score = (SATURATION_FLOOR + saturation) * np.where(value < DARK_VALUE, SATURATION_FLOOR, 1.0)
+        else:
+            self._bin_score = None
+
+
+    def apply(self, image):
+        """
+        image: a full RGB frame or a BorderFrame. Returns (N, 3) uint8 colors.
+        """
+        led_count = self.matrix.led_count
+        if self.matrix.nnz == 0:
+            return np.zeros((led_count, 3), dtype=np.uint8)
+
+        pixels = image.pixels if isinstance(image, BorderFrame) else image.reshape(-1, 3)
+        np.take(pixels, self._indices, axis=0, out=self._samples)
+
+        # keys = led * bins + (r >> s) << 2b | (g >> s) << b | (b >> s)
+        shift = 8 - self.bits
+        np.right_shift(self._samples[:, 0], shift, out=self._keys)
+        for channel in (1, 2):
+            np.left_shift(self._keys, self.bits, out=self._keys)
+            np.right_shift(self._samples[:, channel], shift, out=self._channel)
+            self._keys |= self._channel
+        self._keys += self._slot_base
+
+        weights = self._weights
+        histogram = np.bincount(self._keys, weights=weights, minlength=led_count * self.bins).reshape(led_count, self.bins)
+        if self._bin_score is not None:
+            histogram *= self._bin_score
+        winner = np.argmax(histogram, axis=1) + np.arange(led_count) * self.bins
+
+        # Average the pixels that fell into each LED's winning bin.
+        chosen = self._keys == winner[self._rows]
+        rows = self._rows[chosen]
+        chosen_weights = weights[chosen]
+        total = np.bincount(rows, weights=chosen_weights, minlength=led_count)
+        total[total == 0] = 1.0
+
+        colors = np.empty((led_count, 3), dtype=np.float64)
+        for channel in range(3):
+            colors[:, channel] = np.bincount(rows, weights=self._samples[chosen, channel] * chosen_weights, minlength=led_count)
+        colors /= total[:, None]
+        return np.clip(np.rint(colors), 0, 255).astype(np.uint8)
@@ -0,0 +1,158 @@
+import time
+import numpy as np
+from engine.change_detector import FrameChangeDetector
+from engine.color_processor import ColorProcessor
+from engine.device_interface import DeviceInterface
+from engine.frame_mailbox import FrameMailbox
+from engine.output_config import resolve_outputs
+from engine.rate_governor import FrameRateGovernor
+from engine.screen_capture import ScreenCapturer
+from engine.temporal_filter import TemporalSmoother
+from tools.latency_stats import PipelineStats
+from tools.logger import setup_logger
+
+logger = setup_logger("Fanout")
+
+
+class OutputChannel:
+    """
+    One LED strip: its color processor, smoothing, change detection,
+    mailbox and the DeviceInterface (with its own writer thread) that drives it.
+    """
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config
+        self.monitor = config.get("monitor", 1)
+        self.color_processor = ColorProcessor.from_dict(config)
+        self.device = DeviceInterface.from_dict(config)
+        self.stats = PipelineStats()
+        self.device.stats = self.stats
+        self.mailbox = FrameMailbox()
+        self.change_detector = FrameChangeDetector(
+            keepalive_interval=config.get("keepalive_interval_s", 1.0),
+            enabled=config.get("skip_unchanged_frames", True)
+        )
+        self.smoother = TemporalSmoother.from_dict(config)
+        self.last_colors = None
+        self.last_target = None
+        self.capture_rate_hz = None
+
+
+    def reset(self):
+        self.change_detector.reset()
+        self.smoother.reset()
+        if self.color_processor.letterbox is not None:
+            self.color_processor.letterbox.reset()
+        self.last_colors = None
+        self.last_target = None
+        self.mailbox.open()
+
+
+    def process(self, frame, captured_at, extract_start, brightness, tolerance):
+        """
+        Turn a captured frame into LED colors and hand them to the writer.
+        Returns True if new colors were computed (not skipped or failed).
+        """
+        # Skip extraction and sending while the border and controls are unchanged
+        # and the smoother has caught up with the last target
+        if (not self.change_detector.has_changed(frame, (brightness, tolerance))
+                and self.last_colors is not None and self.smoother.settled):
+            if self.change_detector.keepalive_due():
+                self.mailbox.put(self.last_colors, captured_at)
+                self.change_detector.mark_sent()
+                self.stats.increment("keepalives")
+            else:
+                self.stats.increment("frames_unchanged")
+            return False
+
+        raw_colors = self.color_processor.get_led_colors(frame)
+        correct_start = time.perf_counter()
+        self.stats.record("extract", correct_start - extract_start)
+        target_colors = self.color_processor.adjust_and_correct_colors(
+            colors=raw_colors,
+            brightness=brightness / 100.0,
+            min_brightness_clip=tolerance
+        )
+        colors = self.smoother.apply(target_colors)
+        self.stats.record("correct", time.perf_counter() - correct_start)
+
+        # On a failed frame the LEDs keep the last one.
+        if len(colors) == 0:
+            self.stats.increment("capture_errors")
+            self.change_detector.reset()
+            return False
+
+        if self.mailbox.put(colors, captured_at):
+            self.stats.increment("frames_overwritten")
+        self.change_detector.mark_sent()
+        self.last_colors = colors
+        self.last_target = target_colors
+        self.stats.increment("frames_captured")
+        return True
+
+
+class CaptureGroup:
+    """
+    All outputs fed from one monitor. The monitor is captured once per frame
+    (border strips wide enough for the widest margin) and every channel
+    extracts its own LEDs from that shared frame.
+    """
+
+    def __init__(self, monitor, channels, config):
+        self.monitor = monitor
+        self.channels = channels
+        self.capture_mode = config.get("capture_mode", "border")
+        self.capturer = ScreenCapturer(monitor_index=monitor)
+        self.governor = FrameRateGovernor.from_dict(config)
+        # The slowest link in the group limits how fast frames are worth producing.
+        self.governor.link_hz = min(
+            FrameRateGovernor.link_rate(channel.device.baudrate, channel.device.expected_led_count or 0)
+            for channel in channels
+        )
+
+
+    @property
+    def margin(self):
+        # Grows while a channel samples inside letterbox bars or zones reach inwards;
+        # None when a channel needs the full frame.
+        margins = [channel.color_processor.capture_margin for channel in self.channels]
+        if None in margins:
+            return None
+        return max(margins)
+
+
+    @property
+    def name(self):
+        return f"monitor{self.monitor}"
+
+
+    def capture(self):
+        margin = self.margin
+        if self.capture_mode == "border" and margin is not None:
+            return self.capturer.capture_border(margin)
+        return self.capturer.capture_screen()
+
+
+    def motion_colors(self):
+        """Latest target colors of every channel, for the rate governor."""
+        targets = [channel.last_target for channel in self.channels if channel.last_target is not None]
+        return np.concatenate(targets) if targets else None
+
+
+def build_outputs(config):
+    """
+    Create one OutputChannel per configured output and group them by monitor.
+    Returns (channels, capture_groups).
+    """
+    channels = [OutputChannel(name, output) for name, output in resolve_outputs(config)]
+
+    by_monitor = {}
+    for channel in channels:
+        by_monitor.setdefault(channel.monitor, []).append(channel)
+    groups = [CaptureGroup(monitor, members, config) for monitor, members in by_monitor.items()]
+
+    for group in groups:
+        names = ", ".join(channel.name for channel in group.channels)
+        logger.info(f"Monitor {group.monitor}: {names} ({group.capture_mode}, margin {group.margin})")
+    return channels, groups
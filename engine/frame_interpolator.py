@@ -0,0 +1,81 @@
+import numpy as np
+from tools.logger import setup_logger
+
+logger = setup_logger("FrameInterpolator")
+
+INTERPOLATION_MODES = ("none", "linear", "extrapolate")
+MIN_FRAME_PERIOD = 0.001
+MAX_FRAME_PERIOD = 0.25  # slower than this and the content is treated as a new still frame
+
+
+class FrameInterpolator:
+    """
+    Produces in-between LED frames from the last two captured frames so the
+    writer can refresh the strip faster than the capture rate.
+
+        linear       blends from the previous to the newest frame over one capture
+                     period; smooth, but shows content one capture period late
+        extrapolate  continues the motion past the newest frame by up to
+                     max_extrapolation periods; no added latency, may overshoot
+
+    sample() returns None once the newest frame has been fully reached, so a
+    static scene does not keep the link busy.
+    """
+
+    def __init__(self, mode="linear", max_extrapolation=0.5):
+        if mode not in INTERPOLATION_MODES:
+            logger.warning(f"Unknown interpolation mode '{mode}', using 'linear'.")
+            mode = "linear"
+        self.mode = mode
+        self.max_extrapolation = max_extrapolation
+        self._previous = None
+        self._current = None
+        self._output = None
+        self._arrived_at = None
+        self._period = MAX_FRAME_PERIOD
+        self._finished = True
+        self.captured_at = None
+
+
+    def push(self, colors, now, captured_at=None):
+        colors = np.asarray(colors)
+        if self._current is None or self._current.shape != colors.shape:
+            self._previous = np.empty(colors.shape, dtype=np.float32)
+            self._current = np.empty(colors.shape, dtype=np.float32)
+            self._output = np.empty(colors.shape, dtype=np.float32)
+            self._current[:] = colors
+            self._arrived_at = None
+
+        if self._arrived_at is not None:
+            self._period = min(MAX_FRAME_PERIOD, max(MIN_FRAME_PERIOD, now - self._arrived_at))
+        if self.mode == "linear" and self._arrived_at is not None and not self._finished:
+            # Start the new blend from what the strip shows right now to avoid a jump.
+            np.copyto(self._previous, self._output)
+        else:
+            np.copyto(self._previous, self._current)
+        self._current[:] = colors
+        self._arrived_at = now
+        self._finished = False
+        self.captured_at = captured_at
+
+
+    def sample(self, now):
+        """
+        The frame to show at `now`, or None if there is nothing new to send.
+        """
+        if self._finished or self._current is None:
+            return None
+
+        progress = (now - self._arrived_at) / self._period
+        if self.mode == "extrapolate":
+            position = 1.0 + min(progress, self.max_extrapolation)
+            self._finished = progress >= self.max_extrapolation
+        else:
+            position = min(progress, 1.0)
+            self._finished = progress >= 1.0
+
+        # output = previous + (current - previous) * position
+        np.subtract(self._current, self._previous, out=self._output)
+        self._output *= position
+        self._output += self._previous
+        return np.clip(np.rint(self._output), 0, 255).astype(np.uint8)
@@ -0,0 +1,68 @@
+import collections
+import threading
+import time
+
+# What the writer's color generator yields for a mailbox frame.
+TimedFrame = collections.namedtuple("TimedFrame", ["colors", "captured_at"])
+
+
+class FrameMailbox:
+    """
+    Single-slot handoff between the capture worker and the serial writer.
+
+    put() overwrites whatever the writer has not picked up yet, so the writer
+    always gets the newest frame and never works through a backlog. get() blocks
+    until a frame newer than the last one it returned arrives; on underrun the
+    writer simply sends nothing and the LEDs keep showing the last frame.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._frame = None
+        self._sequence = 0
+        self._taken = 0
+        self._closed = False
+        self.frames_put = 0
+        self.frames_overwritten = 0
+
+
+    def put(self, colors, captured_at=None):
+        """
+        Publish a frame. Returns True if it replaced one the writer never took.
+        """
+        with self._condition:
+            overwritten = self._sequence != self._taken
+            if overwritten:
+                self.frames_overwritten += 1
+            self._sequence += 1
+            self.frames_put += 1
+            self._frame = (colors, captured_at, time.perf_counter())
+            self._condition.notify()
+        return overwritten
+
+
+    def get(self, timeout=None):
+        """
+        Returns (colors, captured_at, put_at) for the newest unseen frame,
+        or None on timeout or once the mailbox is closed.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._closed or self._sequence != self._taken, timeout=timeout):
+                return None
+            if self._closed:
+                return None
+            self._taken = self._sequence
+            return self._frame
+
+
+    def open(self):
+        with self._condition:
+            self._frame = None
+            self._taken = self._sequence
+            self._closed = False
+
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
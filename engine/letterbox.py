@@ -0,0 +1,170 @@
+import numpy as np
+from engine.border_frame import BorderFrame
+from tools.logger import setup_logger
+
+logger = setup_logger("LetterboxDetector")
+
+SCAN_POSITIONS = (0.25, 0.5, 0.75)  # full frames: scan lines at these fractions of the frame
+MAX_BAR_FRACTION = 0.3  # bars thicker than this share of the frame are not trusted
+
+
+class LetterboxDetector:
+    """
+    Finds black bars (letterbox top/bottom, pillarbox left/right) by scanning a
+    few lines of the frame, and keeps a cached crop of the active picture area.
+
+    On a full frame it scans three rows and three columns; on a BorderFrame it
+    scans the innermost row and column of each strip, which are complete lines
+    of the frame. A scan runs every `interval` frames and never touches more
+    than those lines.
+
+    The crop only changes when bars change by more than `tolerance` pixels.
+    Thinner bars are taken at once, since they prove that content reaches
+    further out. Thicker bars must be seen on `confirm_scans` scans in a row,
+    so a dark scene does not eat into the picture. Lines with no lit pixel
+    (fade to black) are ignored.
+    """
+
+    def __init__(self, threshold=16, interval=5, confirm_scans=3, tolerance=4):
+        self.threshold = threshold
+        self.interval = max(1, int(interval))
+        self.confirm_scans = max(1, int(confirm_scans))
+        self.tolerance = tolerance
+        self.bars = (0, 0, 0, 0)  # top, bottom, left, right in pixels of the scanned frame
+        self._frame_shape = None
+        self._frames = 0
+        self._candidate = None
+        self._candidate_scans = 0
+
+
+    @classmethod
+    def from_dict(cls, config):
+        """
+        A detector if config["letterbox_detection"] is set, otherwise None.
+        """
+        if not config.get("letterbox_detection", False):
+            return None
+        return cls(
+            threshold=config.get("letterbox_threshold", 16),
+            interval=config.get("letterbox_interval_frames", 5),
+            confirm_scans=config.get("letterbox_confirm_scans", 3)
+        )
+
+
+    def reset(self):
+        self.bars = (0, 0, 0, 0)
+        self._frame_shape = None
+        self._frames = 0
+        self._candidate = None
+        self._candidate_scans = 0
+
+
+    def crop(self, frame_shape):
+        """
+        The cached bars scaled to a frame of `frame_shape` (e.g. a downscaled copy).
+        Scaled bars are rounded up, so pixels that are partly bar are cropped too.
+        """
+        if self._frame_shape is None or not any(self.bars):
+            return (0, 0, 0, 0)
+        h, w = frame_shape[:2]
+        source_h, source_w = self._frame_shape
+        top, bottom, left, right = self.bars
+        return (-(-top * h // source_h), -(-bottom * h // source_h), -(-left * w // source_w), -(-right * w // source_w))
+
+
+    def update(self, image):
+        """
+        Count a frame and scan it if a scan is due. Returns True if the crop changed.
+        """
+        if image.shape[:2] != self._frame_shape:
+            self.reset()
+            self._frame_shape = image.shape[:2]
+        self._frames += 1
+        if (self._frames - 1) % self.interval != 0:
+            return False
+
+        detected = self._scan(image)
+        if detected is None:
+            return False
+        return self._settle(detected)
+
+
+    def _lines(self, image):
+        """
+        Returns (columns, rows): lists of full-length (L, 3) pixel lines.
+        """
+        h, w = image.shape[:2]
+        if not isinstance(image, BorderFrame):
+            columns = [image[:, int(w * position)] for position in SCAN_POSITIONS]
+            rows = [image[int(h * position)] for position in SCAN_POSITIONS]
+            return columns, rows
+
+        m = image.margin
+        top, bottom = image.strip("top"), image.strip("bottom")
+        left, right = image.strip("left"), image.strip("right")
+        columns = [
+            np.concatenate([top[:, m - 1], left[:, m - 1], bottom[:, m - 1]]),
+            np.concatenate([top[:, w - m], right[:, 0], bottom[:, w - m]])
+        ]
+        rows = [top[m - 1], bottom[0]]
+        return columns, rows
+
+
+    def _bar_extent(self, lines):
+        """
+        Smallest (leading, trailing) run of dark pixels over lines that have any lit pixel.
+        """
+        leading = trailing = None
+        for line in lines:
+            lit = np.flatnonzero(line.max(axis=1) > self.threshold)
+            if len(lit) == 0:
+                continue
+            first, last = lit[0], len(line) - 1 - lit[-1]
+            leading = first if leading is None else min(leading, first)
+            trailing = last if trailing is None else min(trailing, last)
+        return leading, trailing
+
+
+    def _scan(self, image):
+        h, w = image.shape[:2]
+        columns, rows = self._lines(image)
+        top, bottom = self._bar_extent(columns)
+        left, right = self._bar_extent(rows)
+        if top is None and left is None:
+            return None
+
+        top, bottom = (0, 0) if top is None else (top, bottom)
+        left, right = (0, 0) if left is None else (left, right)
+        max_y = int(h * MAX_BAR_FRACTION)
+        max_x = int(w * MAX_BAR_FRACTION)
+        # Asymmetric bars are usually a dark edge in the picture, not a bar; keep them symmetric.
+        vertical = min(top, bottom, max_y)
+        horizontal = min(left, right, max_x)
+        return (vertical, vertical, horizontal, horizontal)
+
+
+    def _settle(self, detected):
+        if all(abs(new - old) <= self.tolerance for new, old in zip(detected, self.bars)):
+            self._candidate = None
+            return False
+
+        if all(new <= old for new, old in zip(detected, self.bars)):
+            self._candidate = None
+            return self._apply(detected)
+
+        if self._candidate is not None and all(abs(new - old) <= self.tolerance for new, old in zip(detected, self._candidate)):
+            self._candidate_scans += 1
+        else:
+            self._candidate = detected
+            self._candidate_scans = 1
+        if self._candidate_scans < self.confirm_scans:
+            return False
+        self._candidate = None
+        return self._apply(detected)
+
+
+    def _apply(self, bars):
+        self.bars = tuple(int(bar) for bar in bars)
+        top, bottom, left, right = self.bars
+        logger.info(f"Active area changed: bars top/bottom {top}px, left/right {left}px")
+        return True
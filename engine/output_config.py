@@ -0,0 +1,55 @@
+"""
+Per-output configuration.
+
+A config may list several LED outputs under "outputs"; every entry is merged
+over the top-level settings, so an output only lists what differs:
+
+    "outputs": [
+        {"name": "left",  "monitor": 1, "serial_port": "COM6"},
+        {"name": "right", "monitor": 2, "serial_port": "COM7",
+         "led_config": {"top": 40, "right": 20, "bottom": 40, "left": 0}}
+    ]
+
+Without "outputs" the top-level settings describe a single output.
+"""
+
+DEFAULT_OUTPUT_NAME = "main"
+
+
+def resolve_outputs(config):
+    """
+    Returns a list of (name, merged config) pairs, one per LED output.
+    """
+    base = {key: value for key, value in config.items() if key != "outputs"}
+    outputs = config.get("outputs") or []
+    if not outputs:
+        return [(DEFAULT_OUTPUT_NAME, dict(base, name=DEFAULT_OUTPUT_NAME))]
+
+    resolved = []
+    for index, output in enumerate(outputs):
+        name = output.get("name") or f"output{index + 1}"
+        merged = dict(base)
+        merged.update(output)
+        merged["name"] = name
+        resolved.append((name, merged))
+    return resolved
+
+
+def led_count(config):
+    """
+    Number of LEDs described by a config: one per zone, otherwise the led_config side counts.
+    """
+    if config.get("zones"):
+        return len(config["zones"])
+    return sum(config.get("led_config", {}).values())
+
+
+def output_config(config, name=None):
+    """
+    The merged config of the output called `name`; the first output if name is None or unknown.
+    """
+    outputs = resolve_outputs(config)
+    for output_name, merged in outputs:
+        if output_name == name:
+            return merged
+    return outputs[0][1]
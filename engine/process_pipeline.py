@@ -0,0 +1,250 @@
+import json
+import multiprocessing
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from engine.output_config import led_count, output_config
+from tools.logger import setup_logger
+
+logger = setup_logger("ProcessPipeline")
+
+# Shared block layout: a float64 header followed by the LED colors (led_capacity x 3 uint8).
+HEADER_FIELDS = ("sequence", "led_count", "captured_at", "capture_s", "extract_s", "correct_s", "errors", "unchanged", "rate_hz")
+HEADER_BYTES = 128
+SEQLOCK_RETRIES = 100
+
+
+def _frame_views(buffer, led_capacity):
+    header = np.ndarray((len(HEADER_FIELDS),), dtype=np.float64, buffer=buffer)
+    leds = np.ndarray((led_capacity, 3), dtype=np.uint8, buffer=buffer, offset=HEADER_BYTES)
+    return header, leds
+
+
+def color_worker_main(config_path, output_name, shm_name, led_capacity, brightness, tolerance, frame_ready, stop_event):
+    """
+    Entry point of the color process: capture the output's monitor, extract and
+    correct at update_rate_hz and publish every frame into shared memory.
+    Runs with its own GIL.
+    """
+    # Imported here so the parent never opens a capture session for this process.
+    from engine.change_detector import FrameChangeDetector
+    from engine.color_processor import ColorProcessor
+    from engine.rate_governor import FrameRateGovernor
+    from engine.temporal_filter import TemporalSmoother
+    from engine.screen_capture import ScreenCapturer
+
+    worker_logger = setup_logger("ColorWorker")
+    with open(config_path) as f:
+        config = output_config(json.load(f), output_name)
+
+    # Spawned children share the parent's resource tracker, so attaching here
+    # does not hand ownership over; the parent alone unlinks the block.
+    shm = shared_memory.SharedMemory(name=shm_name)
+    header, leds = _frame_views(shm.buf, led_capacity)
+    capturer = None
+    try:
+        try:
+            color_processor = ColorProcessor.from_dict(config)
+            capturer = ScreenCapturer(monitor_index=config.get("monitor", 1))
+        except Exception as e:
+            worker_logger.error(f"Color worker failed to start: {e}")
+            return
+        governor = FrameRateGovernor.from_dict(config)
+        capture_mode = config.get("capture_mode", "border")
+        change_detector = FrameChangeDetector(
+            keepalive_interval=config.get("keepalive_interval_s", 1.0),
+            enabled=config.get("skip_unchanged_frames", True)
+        )
+        smoother = TemporalSmoother.from_dict(config)
+        worker_logger.info(f"Color worker started at {governor.describe()} (mode: {capture_mode}, smoothing: {smoother.mode})")
+
+        while not stop_event.is_set():
+            frame_start = time.perf_counter()
+            header[8] = governor.rate_hz
+            processed_colors = None
+            try:
+                margin = color_processor.capture_margin
+                if capture_mode == "border" and margin is not None:
+                    frame = capturer.capture_border(margin)
+                else:
+                    frame = capturer.capture_screen()
+                extract_start = time.perf_counter()
+
+                if frame is None:
+                    header[6] += 1
+                elif not change_detector.has_changed(frame, (brightness.value, tolerance.value)) and header[0] > 0 and smoother.settled:
+                    if change_detector.keepalive_due():
+                        # Republish the LEDs already in the slot.
+                        header[0] += 1
+                        header[2:6] = (frame_start, extract_start - frame_start, 0.0, 0.0)
+                        header[0] += 1
+                        change_detector.mark_sent()
+                        frame_ready.set()
+                    else:
+                        header[7] += 1
+                else:
+                    raw_colors = color_processor.get_led_colors(frame)
+                    correct_start = time.perf_counter()
+                    target_colors = color_processor.adjust_and_correct_colors(
+                        colors=raw_colors,
+                        brightness=brightness.value,
+                        min_brightness_clip=tolerance.value
+                    )
+                    colors = smoother.apply(target_colors)
+                    done = time.perf_counter()
+
+                    count = len(colors)
+                    if count == 0 or count > led_capacity:
+                        header[6] += 1
+                        change_detector.reset()
+                    else:
+                        # Seqlock: an odd sequence tells the reader a write is in progress.
+                        header[0] += 1
+                        leds[:count] = colors
+                        header[1:6] = (count, frame_start, extract_start - frame_start,
+                                       correct_start - extract_start, done - correct_start)
+                        header[0] += 1
+                        change_detector.mark_sent()
+                        processed_colors = target_colors
+                        frame_ready.set()
+            except Exception as e:
+                header[6] += 1
+                worker_logger.error(f"Color worker error: {e}")
+
+            frame_time = time.perf_counter() - frame_start
+            governor.report_frame(frame_time if processed_colors is not None else None, processed_colors)
+            sleep_time = governor.interval - frame_time
+            if sleep_time > 0:
+                stop_event.wait(sleep_time)
+    finally:
+        if capturer:
+            capturer.close()
+        del header, leds
+        shm.close()
+        worker_logger.info("Color worker ended.")
+
+
+class ProcessColorPipeline:
+    """
+    Runs capture and color processing in a separate process so the tray and the
+    serial writer keep their GIL. Frames come back through one shared-memory slot
+    guarded by a seqlock; read_frame() always returns the newest one.
+
+    captured_at is a perf_counter() value from the worker; perf_counter uses the
+    system-wide monotonic clock, so it is comparable across processes.
+    """
+
+    def __init__(self, config_path, led_capacity, output_name=None):
+        self.config_path = config_path
+        self.output_name = output_name  # entry of config["outputs"] the worker drives
+        self.led_capacity = led_capacity
+        self._context = multiprocessing.get_context("spawn")
+        self._brightness = self._context.Value("d", 1.0, lock=False)
+        self._tolerance = self._context.Value("i", 28, lock=False)
+        self._frame_ready = self._context.Event()
+        self._stop_event = self._context.Event()
+        self._process = None
+        self._shm = None
+        self._header = None
+        self._leds = None
+        self._last_sequence = 0
+
+
+    @classmethod
+    def from_config(cls, config_path="config/config.json", output_name=None):
+        with open(config_path) as f:
+            config = output_config(json.load(f), output_name)
+        return cls(config_path, led_capacity=max(1, led_count(config)), output_name=config["name"])
+
+
+    def start(self):
+        if self.is_alive():
+            return
+        self._shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + self.led_capacity * 3)
+        self._header, self._leds = _frame_views(self._shm.buf, self.led_capacity)
+        self._header[:] = 0
+        self._last_sequence = 0
+        self._frame_ready.clear()
+        self._stop_event.clear()
+        self._process = self._context.Process(
+            target=color_worker_main,
+            args=(self.config_path, self.output_name, self._shm.name, self.led_capacity, self._brightness,
+                  self._tolerance, self._frame_ready, self._stop_event),
+            name="ColorWorker",
+            daemon=True
+        )
+        self._process.start()
+        logger.info(f"Color worker process started (pid {self._process.pid}).")
+
+
+    def stop(self):
+        self._stop_event.set()
+        if self._process is not None:
+            self._process.join(timeout=3)
+            if self._process.is_alive():
+                logger.warning("Color worker did not stop, terminating it.")
+                self._process.terminate()
+                self._process.join(timeout=1)
+            self._process = None
+        if self._shm is not None:
+            self._header = None
+            self._leds = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+
+    def set_controls(self, brightness, min_brightness_clip):
+        self._brightness.value = brightness
+        self._tolerance.value = int(min_brightness_clip)
+
+
+    @property
+    def errors(self):
+        return int(self._header[6]) if self._header is not None else 0
+
+
+    @property
+    def unchanged(self):
+        return int(self._header[7]) if self._header is not None else 0
+
+
+    @property
+    def rate_hz(self):
+        return float(self._header[8]) if self._header is not None else None
+
+
+    def read_frame(self, timeout=None):
+        """
+        Wait for a frame newer than the last one returned.
+        Returns (colors, timings) with timings holding captured_at and the
+        capture/extract/correct durations, or None on timeout.
+        """
+        if self._header is None:
+            return None
+        if not self._frame_ready.wait(timeout):
+            return None
+        self._frame_ready.clear()
+
+        for _ in range(SEQLOCK_RETRIES):
+            sequence = self._header[0]
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            count = int(self._header[1])
+            timings = self._header[2:6].copy()
+            colors = self._leds[:count].copy()
+            if self._header[0] == sequence:
+                break
+        else:
+            return None
+
+        if sequence == self._last_sequence:
+            return None
+        self._last_sequence = sequence
+        captured_at, capture_s, extract_s, correct_s = (float(value) for value in timings)
+        return colors, {"captured_at": captured_at, "capture": capture_s, "extract": extract_s, "correct": correct_s}
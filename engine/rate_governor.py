@@ -0,0 +1,121 @@
+import json
+import numpy as np
+from engine.device_interface import SERIAL_BITS_PER_BYTE, LED_SHOW_SECONDS_PER_LED, LED_LATCH_SECONDS
+from engine.output_config import led_count
+from tools.logger import setup_logger
+
+logger = setup_logger("RateGovernor")
+
+COMPUTE_BUDGET = 0.75  # share of each frame interval the capture/color work may use
+LINK_BUDGET = 0.9  # share of the serial link's frame rate we plan to use
+MOTION_FULL = 0.02  # mean per-channel LED change (0..1) that counts as full motion
+COST_ALPHA = 0.1
+MOTION_RISE_ALPHA = 0.5  # react to motion within a couple of frames...
+MOTION_FALL_ALPHA = 0.05  # ...but only slow down after it has stayed calm for a while
+RATE_LOG_STEP = 10  # Hz change between debug log lines
+
+
+class FrameRateGovernor:
+    """
+    Picks the capture rate between min_hz and max_hz.
+
+    The ceiling is the lowest of max_hz, what the measured capture/color cost
+    can sustain and what the serial link can carry for this LED count. Within
+    that, the rate follows the amount of LED motion: static content runs at
+    min_hz and fast-changing content at the ceiling. With enabled=False the
+    rate stays at fixed_hz.
+    """
+
+    def __init__(self, fixed_hz=30, min_hz=15, max_hz=120, baudrate=115200, led_count=0, enabled=True):
+        self.enabled = enabled
+        self.fixed_hz = fixed_hz
+        self.min_hz = min(min_hz, max_hz)
+        self.max_hz = max_hz
+        self.link_hz = self.link_rate(baudrate, led_count)
+        self.compute_hz = max_hz
+        self.rate_hz = fixed_hz if not enabled else min(max(fixed_hz, self.min_hz), self.ceiling_hz)
+        self._cost = None
+        self._motion = 1.0  # start fast until the content proves to be calm
+        self._previous = None
+        self._logged_rate = self.rate_hz
+
+
+    @classmethod
+    def from_config(cls, config_path="config/config.json"):
+        with open(config_path) as f:
+            config = json.load(f)
+        return cls.from_dict(config)
+
+
+    @classmethod
+    def from_dict(cls, config):
+        update_rate = config.get("update_rate_hz", 30)
+        return cls(
+            fixed_hz=update_rate,
+            min_hz=config.get("min_rate_hz", 15),
+            max_hz=config.get("max_rate_hz", 120),
+            baudrate=config.get("baud_rate", 115200),
+            led_count=led_count(config),
+            enabled=config.get("adaptive_rate", False)
+        )
+
+
+    @staticmethod
+    def link_rate(baudrate, led_count):
+        """Full frames per second the serial link and the strip can carry."""
+        if led_count <= 0 or baudrate <= 0:
+            return float("inf")
+        frame_bytes = led_count * 3 + 1
+        frame_time = frame_bytes * SERIAL_BITS_PER_BYTE / baudrate + led_count * LED_SHOW_SECONDS_PER_LED + LED_LATCH_SECONDS
+        return LINK_BUDGET / frame_time
+
+
+    @property
+    def ceiling_hz(self):
+        return max(self.min_hz, min(self.max_hz, self.link_hz, self.compute_hz))
+
+
+    @property
+    def interval(self):
+        return 1.0 / self.rate_hz
+
+
+    def report_frame(self, work_seconds=None, colors=None):
+        """
+        Feed one frame: the time spent capturing and processing it (None if it was
+        skipped) and the LED colors it produced (None if unchanged). Returns the new rate.
+        """
+        if not self.enabled:
+            return self.rate_hz
+
+        if work_seconds is not None and colors is not None:
+            self._cost = work_seconds if self._cost is None else self._cost + COST_ALPHA * (work_seconds - self._cost)
+            self.compute_hz = COMPUTE_BUDGET / max(self._cost, 1e-6)
+
+        motion = 0.0
+        if colors is not None:
+            colors = np.asarray(colors)
+            if self._previous is not None and self._previous.shape == colors.shape:
+                motion = float(np.abs(np.subtract(colors, self._previous, dtype=np.int16)).mean()) / 255.0
+            else:
+                motion = MOTION_FULL
+                self._previous = np.empty(colors.shape, dtype=colors.dtype)
+            np.copyto(self._previous, colors)
+
+        alpha = MOTION_RISE_ALPHA if motion > self._motion else MOTION_FALL_ALPHA
+        self._motion += alpha * (motion - self._motion)
+
+        ceiling = self.ceiling_hz
+        activity = min(1.0, self._motion / MOTION_FULL)
+        self.rate_hz = self.min_hz + (ceiling - self.min_hz) * activity
+        if abs(self.rate_hz - self._logged_rate) >= RATE_LOG_STEP:
+            logger.debug(f"Rate {self._logged_rate:.0f} -> {self.rate_hz:.0f} Hz (ceiling {ceiling:.0f} Hz, motion {self._motion:.4f})")
+            self._logged_rate = self.rate_hz
+        return self.rate_hz
+
+
+    def describe(self):
+        if not self.enabled:
+            return f"fixed {self.fixed_hz} Hz"
+        return (f"{self.rate_hz:.0f} Hz (range {self.min_hz}-{self.ceiling_hz:.0f} Hz; "
+                f"link {self.link_hz:.0f} Hz, compute {self.compute_hz:.0f} Hz)")
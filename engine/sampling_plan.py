@@ -0,0 +1,252 @@
+import cv2
+import numpy as np
+from engine.border_frame import BorderFrame
+from tools.logger import setup_logger
+
+logger = setup_logger("SamplingPlan")
+
+ORDERINGS = {
+    "clockwise": ["bottom", "right", "top", "left"],
+    "counterclockwise": ["bottom", "left", "top", "right"]
+}
+
+
+def _reflect_101(indices, length):
+    # Same border rule as cv2.BORDER_REFLECT_101, used by GaussianBlur.
+    if length == 1:
+        return np.zeros_like(indices)
+    indices = np.abs(indices)
+    return np.where(indices >= length, 2 * (length - 1) - indices, indices)
+
+
+def _fold_blur(weights, kernel):
+    """
+    Move a weight vector from blurred-pixel space to source-pixel space,
+    so that sum(w * blur(x)) == sum(fold(w) * x).
+    """
+    length = len(weights)
+    radius = len(kernel) // 2
+    positions = np.arange(length)
+    folded = np.zeros(length, dtype=np.float64)
+    for tap, value in enumerate(kernel):
+        np.add.at(folded, _reflect_101(positions + tap - radius, length), weights * value)
+    return folded
+
+
+def _resized_gaussian(kernel_size, length, sigma):
+    center = kernel_size // 2
+    taps = np.arange(kernel_size, dtype=np.float64) - center
+    gaussian = np.exp(-(taps * taps) / (2 * sigma * sigma))
+    return cv2.resize(gaussian.reshape(1, -1), (length, 1)).ravel().astype(np.float64)
+
+
+MAX_PADDING_RATIO = 2.0  # padded rows are used while they store at most this many times the real weights
+
+
+class SparseWeights:
+    """
+    An (LEDs x pixels) weight matrix; the pixels of LED i are
+    indices[indptr[i]:indptr[i + 1]] with the matching weights. Applying it to a
+    frame is one gather and one weighted sum, so the cost depends only on the
+    number of stored weights, not on how the LEDs are laid out.
+
+    When rows are of similar length they are padded to the longest row and
+    summed with a batched matmul; otherwise the products are summed per row
+    with a segmented reduce.
+    """
+
+    def __init__(self, indptr, indices, weights):
+        self.indptr = np.asarray(indptr, dtype=np.intp)
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.led_count = len(self.indptr) - 1
+
+        row_lengths = np.diff(self.indptr)
+        window = int(row_lengths.max()) if self.led_count else 0
+        self.padded = self.nnz > 0 and self.led_count * window <= MAX_PADDING_RATIO * self.nnz
+
+        if self.padded:
+            # Padding points at pixel 0 with weight 0.
+            columns = np.arange(window)
+            mask = columns[None, :] < row_lengths[:, None]
+            self._padded_indices = np.zeros((self.led_count, window), dtype=np.intp)
+            self._padded_weights = np.zeros((self.led_count, 1, window), dtype=np.float32)
+            self._padded_indices[mask] = self.indices
+            self._padded_weights[:, 0, :][mask] = self.weights
+        else:
+            # reduceat cannot express empty rows, so only non-empty rows are summed and scattered back.
+            self._filled = np.flatnonzero(row_lengths)
+            self._starts = self.indptr[:-1][self._filled]
+            self._colors = np.zeros((self.led_count, 3), dtype=np.float32)
+            self._channel_weights = np.repeat(self.weights.reshape(-1, 1), 3, axis=1)
+            self._samples = np.empty((self.nnz, 3), dtype=np.uint8)
+            self._products = np.empty((self.nnz, 3), dtype=np.float32)
+
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Build from one (pixel indices, weights) pair per LED.
+        """
+        indptr = np.zeros(len(rows) + 1, dtype=np.intp)
+        indptr[1:] = np.cumsum([np.size(indices) for indices, _ in rows])
+        if indptr[-1] == 0:
+            return cls(indptr, np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32))
+        indices = np.concatenate([np.ravel(indices) for indices, _ in rows])
+        weights = np.concatenate([np.ravel(weights) for _, weights in rows])
+        return cls(indptr, indices, weights)
+
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+
+    def apply(self, image):
+        """
+        image: a full RGB frame, a BorderFrame or a (P, 3) pixel array.
+        Returns the (N, 3) uint8 LED colors.
+        """
+        if self.nnz == 0:
+            return np.zeros((self.led_count, 3), dtype=np.uint8)
+
+        pixels = image.pixels if isinstance(image, BorderFrame) else image.reshape(-1, 3)
+        if self.padded:
+            samples = np.take(pixels, self._padded_indices, axis=0).astype(np.float32)
+            colors = np.matmul(self._padded_weights, samples)[:, 0, :]
+        else:
+            np.take(pixels, self.indices, axis=0, out=self._samples)
+            np.multiply(self._samples, self._channel_weights, out=self._products)
+            colors = self._colors
+            colors[self._filled] = np.add.reduceat(self._products, self._starts, axis=0)
+        return np.clip(colors, 0, 255).astype(np.uint8)
+
+
+class SamplingPlan:
+    """
+    Pixel coordinates and weights for every LED, computed once per layout and
+    frame size and compiled into one SparseWeights matrix, so applying the plan
+    to a frame is a single sparse product producing an (N, 3) uint8 array.
+
+    The weights reproduce the per-side pre-blur, overlapping segmentation and
+    resized Gaussian kernel that were previously rebuilt on every frame.
+
+    With border_margin set, the plan indexes the packed buffer of a BorderFrame
+    captured with that margin instead of a full frame. With crop set to
+    (top, bottom, left, right) bars, the LEDs sample the edges of the active
+    area inside the bars instead of the edges of the frame.
+    """
+
+    def __init__(self, led_config, margin, order, start_side, enable_corners, frame_shape, overlap_ratio=0.1, sigma=1.0, border_margin=None, crop=(0, 0, 0, 0)):
+        self.frame_shape = tuple(frame_shape[:2])
+        self.margin = margin
+        self.border_margin = border_margin
+        self.overlap_ratio = overlap_ratio
+        self.sigma = sigma
+
+        h, w = self.frame_shape
+        top, bottom, left, right = crop
+        self.origin = (top, left)
+        self.area_shape = (h - top - bottom, w - left - right)
+        self.corner_margin = margin if enable_corners else 0
+
+        start_index = ORDERINGS[order].index(start_side)
+        self.side_order = ORDERINGS[order][start_index:] + ORDERINGS[order][:start_index]
+
+        leds = []
+        for side in self.side_order:
+            leds.extend(self._build_side(side, int(led_config.get(side, 0))))
+
+        self.led_count = len(leds)
+
+        # Indices are flat offsets into the (h * w, 3) view of the frame.
+        rows = []
+        for side, along, led_weights in leds:
+            pixel_rows, pixel_cols = self._to_pixels(side, along)
+            pixel_rows = pixel_rows + top
+            pixel_cols = pixel_cols + left
+            if border_margin is not None:
+                indices = BorderFrame.pixel_index(pixel_rows, pixel_cols, self.frame_shape, border_margin)
+            else:
+                indices = pixel_rows * w + pixel_cols
+            rows.append((indices, led_weights))
+        self.matrix = SparseWeights.from_rows(rows)
+
+        logger.debug(f"Sampling plan built: {self.led_count} LEDs, {self.matrix.nnz} weights, frame={w}x{h}")
+
+
+    def _build_side(self, side, count):
+        if count <= 0:
+            return []
+
+        h, w = self.area_shape
+        m = self.margin
+        length = (w if side in ("top", "bottom") else h) - 2 * self.corner_margin
+        if length <= 0:
+            logger.warning(f"Side '{side}' has no pixels left after corner margin, skipping {count} LEDs.")
+            return []
+
+        blur_kernel = None
+        if m > 5 and length > 5:
+            blur_size = max(3, min(m, length) // 10)
+            if blur_size % 2 == 0:
+                blur_size += 1
+            blur_kernel = cv2.getGaussianKernel(blur_size, 0).ravel()
+
+        segment_length = length / count
+        overlap_pixels = int(segment_length * self.overlap_ratio)
+
+        leds = []
+        for i in range(count):
+            start = max(0, int(i * segment_length) - overlap_pixels)
+            end = min(length, int((i + 1) * segment_length) + overlap_pixels)
+            if i == 0:
+                start = 0
+            if i == count - 1:
+                end = length
+            start = min(start, length - 1)
+            end = max(end, start + 1)
+
+            kernel_size = min(max(5, min(m, end - start) // 4), 15)
+            kernel_size = kernel_size if kernel_size % 2 == 1 else kernel_size + 1
+
+            along_weights = np.zeros(length, dtype=np.float64)
+            along_weights[start:end] = _resized_gaussian(kernel_size, end - start, self.sigma)
+            across_weights = _resized_gaussian(kernel_size, m, self.sigma)
+
+            if blur_kernel is not None:
+                along_weights = _fold_blur(along_weights, blur_kernel)
+                across_weights = _fold_blur(across_weights, blur_kernel)
+
+            nonzero = np.flatnonzero(along_weights)
+            first, last = nonzero[0], nonzero[-1] + 1
+
+            weights = np.outer(across_weights, along_weights[first:last])
+            weights /= weights.sum()
+            leds.append((side, np.arange(first, last), weights))
+
+        return leds
+
+
+    def _to_pixels(self, side, along):
+        h, w = self.area_shape
+        m = self.margin
+        c = self.corner_margin
+        depth, along = np.meshgrid(np.arange(m), along, indexing="ij")
+
+        # Sides are walked clockwise: top left->right, right top->bottom,
+        # bottom right->left, left bottom->top.
+        if side == "top":
+            return depth, c + along
+        if side == "right":
+            return c + along, w - m + depth
+        if side == "bottom":
+            return h - m + depth, w - c - 1 - along
+        return h - c - 1 - along, depth
+
+
+    def apply(self, image):
+        if self.led_count == 0:
+            return np.zeros((0, 3), dtype=np.uint8)
+
+        return self.matrix.apply(image)
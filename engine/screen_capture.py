@@ -1,9 +1,12 @@
 import mss
 import cv2
+import threading
 import numpy as np
+from engine.border_frame import BorderFrame
 from tools.logger import setup_logger
 
 logger = setup_logger("ScreenCapturer")
+LAYOUT_CHECK_INTERVAL = 5.0  # seconds between monitor layout checks
 
 class ScreenCapturer:
     def __init__(self, monitor_index=1):
@@ -24,30 +27,138 @@ class ScreenCapturer:
                 monitor_index = 1
 
         self.monitor_index = monitor_index
+        self._session = None
+        self._session_thread = None
+        self._monitors = None
+        self._monitor = None
+        self._layout_changed = threading.Event()
+        self._layout_watch_stop = None
+        self._frame_buffer = None
+        self._border_buffer = None
         logger.info(f"Using monitor {self.monitor_index} for screen capture.")
 
 
+    def _get_session(self):
+        """
+        Returns the long-lived mss session and the monitor being captured.
+        The session is re-created when it is used from a different thread, after
+        a failed grab, or when the layout watcher saw the monitor layout change.
+        """
+        if self._session is not None and self._session_thread == threading.get_ident():
+            if not self._layout_changed.is_set():
+                return self._session, self._monitor
+            logger.info("Monitor layout changed, re-creating capture session.")
+
+        self._close_session()
+        self._layout_changed.clear()
+        self._session = mss.mss()
+        self._session_thread = threading.get_ident()
+        self._monitors = [dict(m) for m in self._session.monitors]
+        self._start_layout_watch()
+
+        if self.monitor_index >= len(self._monitors):
+            logger.error(f"Monitor {self.monitor_index} is no longer available.")
+            self._monitor = None
+        else:
+            self._monitor = self._monitors[self.monitor_index]
+        return self._session, self._monitor
+
+
+    def _start_layout_watch(self):
+        if self._layout_watch_stop is not None:
+            return
+        self._layout_watch_stop = threading.Event()
+        threading.Thread(target=self._watch_layout, args=(self._layout_watch_stop,), name="MonitorLayoutWatch", daemon=True).start()
+
+
+    def _watch_layout(self, stop):
+        # Opening a probe session takes a while, so it runs here instead of on the capture thread.
+        while not stop.wait(LAYOUT_CHECK_INTERVAL):
+            try:
+                with mss.mss() as probe:
+                    monitors = [dict(m) for m in probe.monitors]
+            except Exception as e:
+                logger.debug(f"Monitor layout check failed: {e}")
+                continue
+            if self._monitors is not None and monitors != self._monitors:
+                self._layout_changed.set()
+
+
+    def close(self):
+        if self._layout_watch_stop is not None:
+            self._layout_watch_stop.set()
+            self._layout_watch_stop = None
+        self._close_session()
+
+
+    def _close_session(self):
+        if self._session is not None:
+            try:
+                self._session.close()
+            except Exception as e:
+                logger.debug(f"Error closing capture session: {e}")
+        self._session = None
+        self._session_thread = None
+
+
     def capture_screen(self):
         """
         Capture the screen as an RGB NumPy array.
+        The returned array is reused and overwritten by the next call.
         """
         try:
-            with mss.mss() as sct:
-                if self.monitor_index >= len(sct.monitors):
-                    logger.error(f"Monitor {self.monitor_index} is no longer available.")
-                    return None
-
-                monitor = sct.monitors[self.monitor_index]
-                screenshot = sct.grab(monitor)
+            sct, monitor = self._get_session()
+            if monitor is None:
+                return None
 
-                img_bgra = np.array(screenshot)
-                img_bgr = img_bgra[:, :, :3]
-                img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+            img_bgra = np.asarray(sct.grab(monitor))
+            shape = img_bgra.shape[:2] + (3,)
+            if self._frame_buffer is None or self._frame_buffer.shape != shape:
+                self._frame_buffer = np.empty(shape, dtype=np.uint8)
 
-                return img_rgb
+            cv2.cvtColor(img_bgra, cv2.COLOR_BGRA2RGB, dst=self._frame_buffer)
+            return self._frame_buffer
 
         except Exception as e:
             logger.exception(f"Failed to capture screen: {e}")
+            self._close_session()
+            return None
+
+
+    def capture_border(self, margin):
+        """
+        Capture only the four margin-wide edge strips of the screen as a BorderFrame.
+        The returned frame is reused and overwritten by the next call.
+        """
+        try:
+            sct, monitor = self._get_session()
+            if monitor is None:
+                return None
+
+            h, w = monitor["height"], monitor["width"]
+            margin = max(1, min(int(margin), min(w, h) // 2 - 1))
+
+            frame = self._border_buffer
+            if frame is None or frame.shape[:2] != (h, w) or frame.margin != margin:
+                frame = self._border_buffer = BorderFrame((h, w), margin)
+
+            for name, top, left, height, width, _ in frame.regions:
+                if height <= 0 or width <= 0:
+                    continue
+                region = {
+                    "top": monitor["top"] + top,
+                    "left": monitor["left"] + left,
+                    "width": width,
+                    "height": height
+                }
+                strip_bgra = np.asarray(sct.grab(region))
+                cv2.cvtColor(strip_bgra, cv2.COLOR_BGRA2RGB, dst=frame.strip(name))
+
+            return frame
+
+        except Exception as e:
+            logger.exception(f"Failed to capture screen border: {e}")
+            self._close_session()
             return None
 
         
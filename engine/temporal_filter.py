@@ -0,0 +1,117 @@
+import time
+import numpy as np
+from tools.logger import setup_logger
+
+logger = setup_logger("TemporalSmoother")
+
+SMOOTHING_MODES = ("none", "ema", "deadband", "adaptive")
+ADAPTIVE_MIN_SCALE = 0.25  # small changes are smoothed with a 4x longer time constant...
+ADAPTIVE_FULL_CHANGE = 64.0  # ...and changes this large (0-255) pass straight through
+SETTLED_TOLERANCE = 0.5  # max per-channel distance from the target that counts as settled
+
+
+class TemporalSmoother:
+    """
+    Per-LED temporal filter applied to the whole (N, 3) color array at once.
+
+    Modes:
+        none      pass colors through
+        ema       exponential moving average with time constant `time_constant`
+        deadband  ema, but an LED only moves once its target is more than
+                  `deadband` away from what it shows (hides flicker on still images)
+        adaptive  ema whose rate grows with the size of the change, so noise is
+                  smoothed heavily while scene cuts still land within a frame
+
+    The filter state lives in preallocated float32 arrays. The blend factor is
+    derived from the time since the previous frame, so smoothing looks the same
+    at any capture rate.
+    """
+
+    def __init__(self, mode="none", time_constant=0.08, deadband=3.0):
+        if mode not in SMOOTHING_MODES:
+            logger.warning(f"Unknown smoothing mode '{mode}', using 'none'.")
+            mode = "none"
+        self.mode = mode
+        self.time_constant = max(1e-3, time_constant)
+        self.deadband = deadband
+        self._state = None
+        self._shown = None
+        self._delta = None
+        self._magnitude = None
+        self._alpha = None
+        self._last_time = None
+        self.settled = True
+
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(
+            mode=config.get("smoothing", "none"),
+            time_constant=config.get("smoothing_time_constant_ms", 80) / 1000.0,
+            deadband=config.get("smoothing_deadband", 3)
+        )
+
+
+    def reset(self):
+        self._state = None
+        self._last_time = None
+        self.settled = True
+
+
+    def _allocate(self, shape):
+        self._state = np.empty(shape, dtype=np.float32)
+        self._shown = np.empty(shape, dtype=np.float32)
+        self._delta = np.empty(shape, dtype=np.float32)
+        self._magnitude = np.empty((shape[0], 1), dtype=np.float32)
+        self._alpha = np.empty((shape[0], 1), dtype=np.float32)
+
+
+    def apply(self, colors, now=None):
+        """
+        Filter one frame of target colors. Returns a new (N, 3) uint8 array.
+        """
+        colors = np.asarray(colors)
+        if self.mode == "none" or len(colors) == 0:
+            return colors
+
+        now = time.perf_counter() if now is None else now
+        if self._state is None or self._state.shape != colors.shape:
+            self._allocate(colors.shape)
+            self._state[:] = colors
+            self._shown[:] = colors
+            self._last_time = now
+            self.settled = True
+            return np.ascontiguousarray(colors, dtype=np.uint8)
+
+        dt = max(0.0, now - self._last_time)
+        self._last_time = now
+        alpha = 1.0 - np.exp(-dt / self.time_constant)
+
+        # delta = target - state
+        np.subtract(colors, self._state, out=self._delta, dtype=np.float32)
+
+        if self.mode == "adaptive":
+            # Per-LED rate between alpha * ADAPTIVE_MIN_SCALE and 1, driven by the largest channel change.
+            np.max(np.abs(self._delta), axis=1, keepdims=True, out=self._magnitude)
+            np.multiply(self._magnitude, 1.0 / ADAPTIVE_FULL_CHANGE, out=self._alpha)
+            np.clip(self._alpha, 0.0, 1.0, out=self._alpha)
+            slow = alpha * ADAPTIVE_MIN_SCALE
+            self._alpha *= 1.0 - slow
+            self._alpha += slow
+            self._delta *= self._alpha
+        else:
+            self._delta *= alpha
+        self._state += self._delta
+
+        if self.mode == "deadband":
+            # Only LEDs whose smoothed value drifted past the dead band are updated.
+            np.subtract(self._state, self._shown, out=self._delta)
+            np.max(np.abs(self._delta), axis=1, keepdims=True, out=self._magnitude)
+            np.copyto(self._shown, self._state, where=self._magnitude > self.deadband)
+            output = self._shown
+        else:
+            output = self._state
+
+        tolerance = max(SETTLED_TOLERANCE, self.deadband) if self.mode == "deadband" else SETTLED_TOLERANCE
+        self.settled = bool(np.abs(np.subtract(colors, output, dtype=np.float32)).max() <= tolerance)
+        return np.rint(output).astype(np.uint8)
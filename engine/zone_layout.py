@@ -0,0 +1,237 @@
+"""
+LED layouts described as sampling zones.
+
+Every LED samples one zone of the frame. Coordinates are fractions of the
+frame width and height (0.0 - 1.0), so a layout works at any resolution:
+
+    "zones": [
+        {"rect": [0.0, 0.0, 0.1, 0.05]},
+        {"polygon": [[0.1, 0.0], [0.2, 0.0], [0.18, 0.06], [0.12, 0.06]], "falloff": "gaussian"},
+        {"areas": [{"rect": [0.2, 0.0, 0.3, 0.05], "weight": 2},
+                   {"rect": [0.2, 0.05, 0.3, 0.2]}]}
+    ]
+
+A zone is a "rect" [x0, y0, x1, y1], a "polygon" of [x, y] points, or a list of
+weighted "areas" made of either. "falloff": "gaussian" weights pixels towards
+the centre of the shape. Zones may overlap, leave gaps or sit anywhere on the
+frame (several rows, partial sides, bias lighting behind a curved monitor).
+
+The layout is compiled once per frame size into a single SparseWeights matrix.
+Large zones are sampled on a grid of at most `max_samples` pixels, so the cost
+of a frame stays bounded by the LED count whatever the shapes are.
+"""
+import cv2
+import numpy as np
+from engine.border_frame import BorderFrame
+from engine.sampling_plan import SparseWeights, ORDERINGS
+from tools.logger import setup_logger
+
+logger = setup_logger("ZoneLayout")
+
+MAX_SAMPLES_PER_ZONE = 1024
+GAUSSIAN_FALLOFF_SIGMA = 0.5  # in half-widths of the shape
+
+
+class ZoneLayout:
+    """
+    One sampling zone per LED, in strip order.
+    """
+
+    def __init__(self, zones, max_samples=MAX_SAMPLES_PER_ZONE):
+        self.zones = [self._normalize(zone) for zone in zones]
+        self.max_samples = max(1, int(max_samples))
+        self._border_depth = None
+        self._border_depth_key = None
+
+
+    @classmethod
+    def from_dict(cls, config):
+        """
+        The layout in config["zones"], or None if the config uses led_config sides.
+        """
+        zones = config.get("zones")
+        if not zones:
+            return None
+        return cls(zones, max_samples=config.get("zone_max_samples", MAX_SAMPLES_PER_ZONE))
+
+
+    @classmethod
+    def from_sides(cls, led_config, order="clockwise", start_side="bottom", enable_corners=False, margin=40, frame_size=(1920, 1080)):
+        """
+        Rectangular zones in the same order as SamplingPlan: sides follow `order`
+        from `start_side`, and LEDs along each side run clockwise.
+        """
+        w, h = frame_size
+        depth_x = margin / w
+        depth_y = margin / h
+        corner_x = depth_x if enable_corners else 0.0
+        corner_y = depth_y if enable_corners else 0.0
+
+        sides = ORDERINGS.get(order, ORDERINGS["clockwise"])
+        start_index = sides.index(start_side) if start_side in sides else 0
+        zones = []
+        for side in sides[start_index:] + sides[:start_index]:
+            count = int(led_config.get(side, 0))
+            for i in range(count):
+                a = i / count
+                b = (i + 1) / count
+                if side == "top":
+                    span = 1.0 - 2 * corner_x
+                    zones.append({"rect": [corner_x + span * a, 0.0, corner_x + span * b, depth_y]})
+                elif side == "right":
+                    span = 1.0 - 2 * corner_y
+                    zones.append({"rect": [1.0 - depth_x, corner_y + span * a, 1.0, corner_y + span * b]})
+                elif side == "bottom":
+                    span = 1.0 - 2 * corner_x
+                    zones.append({"rect": [1.0 - corner_x - span * b, 1.0 - depth_y, 1.0 - corner_x - span * a, 1.0]})
+                elif side == "left":
+                    span = 1.0 - 2 * corner_y
+                    zones.append({"rect": [0.0, 1.0 - corner_y - span * b, depth_x, 1.0 - corner_y - span * a]})
+        return cls(zones)
+
+
+    @property
+    def led_count(self):
+        return len(self.zones)
+
+
+    @staticmethod
+    def _normalize(zone):
+        # Every zone becomes a list of (points, weight, falloff) areas.
+        areas = zone.get("areas") or [zone]
+        normalized = []
+        for area in areas:
+            if "rect" in area:
+                x0, y0, x1, y1 = area["rect"]
+                points = [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+            elif "polygon" in area:
+                points = area["polygon"]
+            else:
+                raise ValueError(f"Zone area needs a 'rect' or 'polygon': {area}")
+            normalized.append({
+                "points": np.asarray(points, dtype=np.float64).reshape(-1, 2),
+                "rect": "rect" in area,
+                "weight": float(area.get("weight", 1.0)),
+                "falloff": area.get("falloff", zone.get("falloff", "flat"))
+            })
+        return normalized
+
+
+    def outlines(self, frame_size):
+        """
+        Pixel outlines of every zone, one list of (K, 2) point arrays per LED (for drawing).
+        """
+        scale = np.asarray(frame_size, dtype=np.float64)
+        return [[area["points"] * scale for area in zone] for zone in self.zones]
+
+
+    def _rasterize(self, area, h, w):
+        """
+        Returns (rows, cols, weights) of the pixels inside one area, on a grid
+        no denser than max_samples pixels.
+        """
+        points = area["points"] * (w, h)
+        x0, y0 = np.floor(points.min(axis=0)).astype(int)
+        x1, y1 = np.ceil(points.max(axis=0)).astype(int)
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(w, max(x1, x0 + 1)), min(h, max(y1, y0 + 1))
+        if x1 <= x0 or y1 <= y0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0)
+
+        box_h, box_w = y1 - y0, x1 - x0
+        if area["rect"]:
+            mask = np.ones((box_h, box_w), dtype=bool)
+        else:
+            mask = np.zeros((box_h, box_w), dtype=np.uint8)
+            cv2.fillPoly(mask, [np.round(points - (x0, y0)).astype(np.int32)], 1)
+            mask = mask.astype(bool)
+
+        step = max(1, int(np.ceil(np.sqrt(mask.sum() / self.max_samples))))
+        offset_y, offset_x = (box_h % step) // 2, (box_w % step) // 2
+        rows, cols = np.nonzero(mask[offset_y::step, offset_x::step])
+        rows = rows * step + offset_y + y0
+        cols = cols * step + offset_x + x0
+
+        weights = np.full(len(rows), area["weight"], dtype=np.float64)
+        if area["falloff"] == "gaussian" and len(rows):
+            center_y, center_x = (y0 + y1 - 1) / 2, (x0 + x1 - 1) / 2
+            dy = (rows - center_y) / max(1.0, box_h / 2)
+            dx = (cols - center_x) / max(1.0, box_w / 2)
+            weights *= np.exp(-(dx * dx + dy * dy) / (2 * GAUSSIAN_FALLOFF_SIGMA ** 2))
+        return rows, cols, weights
+
+
+    def _zone_pixels(self, zone, h, w, crop):
+        """
+        Returns (rows, cols, weights) of one zone on an (h, w) frame, placed inside the crop.
+        """
+        top, bottom, left, right = crop
+        area_h, area_w = h - top - bottom, w - left - right
+        rows, cols, weights = [], [], []
+        for area in zone:
+            area_rows, area_cols, area_weights = self._rasterize(area, area_h, area_w)
+            rows.append(area_rows + top)
+            cols.append(area_cols + left)
+            weights.append(area_weights)
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(weights)
+
+
+    def border_depth(self, frame_shape, crop=(0, 0, 0, 0)):
+        """
+        Margin of the thinnest border ring that holds every sampled pixel on
+        frames of `frame_shape` (cached per frame shape and crop).
+        """
+        key = (tuple(frame_shape[:2]), tuple(crop))
+        if self._border_depth_key != key:
+            h, w = frame_shape[:2]
+            depth = 1
+            for zone in self.zones:
+                rows, cols, _ = self._zone_pixels(zone, h, w, crop)
+                if len(rows):
+                    inset = np.minimum(np.minimum(rows, h - 1 - rows), np.minimum(cols, w - 1 - cols))
+                    depth = max(depth, int(inset.max()) + 1)
+            self._border_depth = depth
+            self._border_depth_key = key
+        return self._border_depth
+
+
+    def compile(self, frame_shape, border_margin=None, crop=(0, 0, 0, 0)):
+        """
+        Build the SparseWeights matrix for frames of `frame_shape`. With
+        border_margin set, indices point into the packed buffer of a BorderFrame
+        and pixels outside its border ring are left out. With crop set to
+        (top, bottom, left, right) bars, zone coordinates are fractions of the
+        active area inside the bars.
+        """
+        h, w = frame_shape[:2]
+        rows_out = []
+        clipped = 0
+        empty = 0
+
+        for zone in self.zones:
+            rows, cols, weights = self._zone_pixels(zone, h, w, crop)
+
+            if border_margin is not None:
+                inside = (rows < border_margin) | (rows >= h - border_margin) | (cols < border_margin) | (cols >= w - border_margin)
+                if not inside.all():
+                    clipped += 1
+                    rows, cols, weights = rows[inside], cols[inside], weights[inside]
+                indices = BorderFrame.pixel_index(rows, cols, (h, w), border_margin) if len(rows) else rows
+            else:
+                indices = rows * w + cols
+
+            total = weights.sum()
+            if total <= 0:
+                empty += 1
+                rows_out.append((np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)))
+                continue
+            rows_out.append((indices, weights / total))
+
+        if clipped:
+            logger.info(f"{clipped} zones reach past the {border_margin}px border ring and are clipped until the capture grows.")
+        if empty:
+            logger.warning(f"{empty} zones cover no pixels of the {w}x{h} frame and stay black.")
+
+        matrix = SparseWeights.from_rows(rows_out)
+        logger.info(f"Zone layout compiled for {w}x{h}: {self.led_count} LEDs, {matrix.nnz} weights")
+        return matrix
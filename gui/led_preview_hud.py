@@ -1,10 +1,11 @@
 import tkinter as tk
+from engine.zone_layout import ZoneLayout
 from tools.logger import setup_logger
 
 logger = setup_logger("LEDPreviewHUD")
 
 class LEDPreviewHUD:
-    def __init__(self, master, led_top_var, led_right_var, led_bottom_var, led_left_var, order_combo, start_side_combo, enable_corners_var):
+    def __init__(self, master, led_top_var, led_right_var, led_bottom_var, led_left_var, order_combo, start_side_combo, enable_corners_var, zones=None):
         self.master = master
         self.led_top_var = led_top_var
         self.led_right_var = led_right_var
@@ -13,12 +14,15 @@ class LEDPreviewHUD:
         self.order_combo = order_combo
         self.start_side_combo = start_side_combo
         self.enable_corners_var = enable_corners_var
+        # Custom "zones" from the config; when set they are drawn instead of the side counts.
+        self.zones = zones
         self.hud_window = None
         self.hud_canvas = None
 
     def open(self):
         self._open_hud()
-        self.master.after(200, self._open_editor)
+        if not self.zones:
+            self.master.after(200, self._open_editor)
 
     def _open_hud(self):
         screen_width = self.master.winfo_screenwidth()
@@ -111,76 +115,23 @@ class LEDPreviewHUD:
         order = self.order_combo.get().lower().replace("-", "")
         start = self.start_side_combo.get().lower()
 
-        corners = ["top-right", "bottom-right", "bottom-left", "top-left"]
-        edges = ["top", "right","bottom", "left"]
-        sides = []
-        for i , _ in enumerate(edges):
-            sides.append(edges[i])
-            sides.append(corners[i])
-
-        if order == "counterclockwise":
-            sides = sides[::-1]
-        start_index = sides.index(start)
-        draw_order = sides[start_index:] + sides[:start_index]
-
-        led_counts = {"top": top, "right": right, "bottom": bottom, "left": left}
-        index = 0
-
-        for side in draw_order:
-            if side in corners:
-                if enable_corners:
-                    if side == "top-right":
-                        x1 = w - thickness
-                        x2 = w
-                        y1, y2 = 0, thickness
-                    if side == "bottom-right":
-                        x1 = w - thickness
-                        x2 = w
-                        y1, y2 = h-thickness, h
-                    if side == "bottom-left":
-                        x1 = 0
-                        x2 = thickness
-                        y1, y2 = h-thickness, h
-                    if side == "top-left":
-                        x1 = 0
-                        x2 = thickness
-                        y1, y2 = 0, thickness
-                    self.hud_canvas.create_rectangle(x1, y1, x2, y2, fill="gray", outline="black")
-                    self.hud_canvas.create_text((x1+x2)/2, (y1+y2)/2, text=str(index + 1), fill="#fffffe", font=("Arial", 14, "bold"))
-                    index += 1
-                continue
-            
-            count = led_counts[side]
-            for i in range(count):
-                i_normal = i
-
-                if side == "bottom" or side == "left":
-                    if order == "clockwise":
-                        i_normal = count - 1 - i 
-                else:
-                    if order == "counterclockwise":
-                        i_normal = count - 1 - i 
-
-                if side == "top":
-                    x1 = thickness + (w - 2 * thickness) * i_normal / count
-                    x2 = thickness + (w - 2 * thickness) * (i_normal + 1) / count
-                    y1, y2 = 0, thickness
-                elif side == "bottom":
-                    x1 = thickness + (w - 2 * thickness) * i_normal / count
-                    x2 = thickness + (w - 2 * thickness) * (i_normal + 1) / count
-                    y1, y2 = h - thickness, h
-                elif side == "left":
-                    y1 = thickness + (h - 2 * thickness) * i_normal / count
-                    y2 = thickness + (h - 2 * thickness) * (i_normal + 1) / count
-                    x1, x2 = 0, thickness
-                elif side == "right":
-                    y1 = thickness + (h - 2 * thickness) * i_normal / count
-                    y2 = thickness + (h - 2 * thickness) * (i_normal + 1) / count
-                    x1, x2 = w - thickness, w
-
-                self.hud_canvas.create_rectangle(x1, y1, x2, y2, fill="gray", outline="black")
-                self.hud_canvas.create_text((x1+x2)/2, (y1+y2)/2, text=str(index + 1), fill="#fffffe", font=("Arial", 14, "bold"))
-                index += 1
+        # Same zones, in the same order, as the LEDs the color processor produces.
+        if self.zones:
+            layout = ZoneLayout(self.zones)
+        else:
+            led_counts = {"top": top, "right": right, "bottom": bottom, "left": left}
+            layout = ZoneLayout.from_sides(led_counts, order, start, enable_corners, margin=thickness, frame_size=(w, h))
+
+            if enable_corners:
+                # Corners are left unlit
+                for x1, y1 in ((0, 0), (w - thickness, 0), (w - thickness, h - thickness), (0, h - thickness)):
+                    self.hud_canvas.create_rectangle(x1, y1, x1 + thickness, y1 + thickness, fill="dimgray", outline="black")
+
+        for index, outline in enumerate(layout.outlines((w, h))):
+            for points in outline:
+                self.hud_canvas.create_polygon(*points.ravel().tolist(), fill="gray", outline="black")
+            x, y = outline[0].mean(axis=0)
+            self.hud_canvas.create_text(x, y, text=str(index + 1), fill="#fffffe", font=("Arial", 14, "bold"))
 
 
     def close(self):
@@ -171,7 +171,9 @@ class SettingsWindow:
 
     # Save handler
     def _save_config_to_file(self):
-        config = {
+        # Keep keys that are not editable here (e.g. capture_mode)
+        config = dict(self.config or {})
+        config.update({
             "led_config": {
                 "top": int(self.led_top.get()),
                 "right": int(self.led_right.get()),
@@ -195,7 +197,7 @@ class SettingsWindow:
             "brightness_tolerance": int(self.brightness_tolerance_var.get()) if hasattr(self, 'brightness_tolerance_var') else 20,
             "version": 1
     
-        }
+        })
 
         # JSON file save
         try:
@@ -298,7 +300,8 @@ class SettingsWindow:
             self.led_left_var,
             self.order_combo,
             self.start_side_combo,
-            self.enable_corners_var
+            self.enable_corners_var,
+            zones=(self.config or {}).get("zones")
         )
         hud.open()
 
@@ -1,9 +1,10 @@
 import sys
 import os
 #sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from engine.device_interface import DeviceInterface
-from engine.screen_capture import ScreenCapturer
-from engine.color_processor import ColorProcessor
+from engine.fanout import build_outputs
+from engine.frame_mailbox import TimedFrame
+from engine.process_pipeline import ProcessColorPipeline
+from engine.rate_governor import FrameRateGovernor
 from gui.settings_window import SettingsWindow
 import tkinter as tk
 import threading
@@ -11,16 +12,23 @@ import pystray
 from PIL import Image
 import time
 from tools.logger import setup_logger
-import queue
+from tools.latency_stats import PipelineStats
+from tools.sampling_profiler import SamplingProfiler
 
 logger = setup_logger("TrayApp")
 CONFIG_FILE = "config/config.json"
+LATENCY_STATS_FILE = "logs/latency_stats.json"  # logs/latency_stats_<output>.json with several outputs
+STATS_LOG_INTERVAL = 30  # seconds between latency summaries
 
 class TrayApp:
     def __init__(self):
         self.running = False
         self.is_device_connected = False
         self.config_path = CONFIG_FILE
+        # One OutputChannel per LED strip, grouped by the monitor that feeds it.
+        # Each channel owns its stats, which are never replaced, so capture and writer threads can share them.
+        self.outputs = []
+        self.capture_groups = []
         self.settings_ui = SettingsWindow(
             config_file=self.config_path,
             on_save=self._on_config_saved,
@@ -37,16 +45,9 @@ class TrayApp:
         self.on_icon_path = "assets/led_on.png"
         self.off_icon_path = "assets/led_off.png"
 
-        self.color_queue = queue.Queue(maxsize=3) 
-        self.capture_thread = None
-
-        self.stats = {
-            "frames_captured": 0,
-            "frames_sent": 0,
-            "capture_errors": 0,
-            "send_errors": 0,
-            "last_stats_time": time.time()
-        }
+        self.capture_threads = []
+        self.color_pipeline = None
+        self.profiler = None
 
 
     def _on_config_saved(self):
@@ -95,33 +96,35 @@ class TrayApp:
         logger.info("Initializing components...")
         
         try:
-            self.color_processor = ColorProcessor.from_config(self.config_path)
-            logger.info("Color processor initialized.")
-            
-            self.screen_capturer = ScreenCapturer()
-            logger.info("Screen capturer initialized.")
-            
-            self.device = DeviceInterface.from_config(self.config_path)
-            logger.info(f"Device interface created: {self.device.port}")
+            self.outputs, self.capture_groups = build_outputs(self.settings_ui.config)
+            logger.info(f"{len(self.outputs)} output(s) on {len(self.capture_groups)} monitor(s) initialized.")
             
-            if first_time_start:
-                # Generate INO
-                ino_path = self.device.generate_ino()
-                logger.info(f".ino file generated: {ino_path}")
-
-                # Upload
-                logger.info("Uploading sketch...")
-                upload_success = self.device.upload_ino()
-                logger.info("Sketch upload successful.") if upload_success else logger.error("Sketch upload failed.")
-
-            # Connect
-            logger.info("Connecting to device...")
-            connect_success = self.device.connect()
-            logger.info("Device connected successfully.") if connect_success else logger.error("Device connection failed.")
-            self.is_device_connected = connect_success
-
-            if self.is_device_connected:
+            connected = 0
+            for channel in self.outputs:
+                device = channel.device
+                logger.info(f"Device interface created for {channel.name}: {device.port}")
+                
+                if first_time_start:
+                    # Generate INO
+                    ino_path = device.generate_ino(self.config_path)
+                    logger.info(f".ino file generated: {ino_path}")
+
+                    # Upload
+                    logger.info(f"Uploading sketch to {device.port}...")
+                    upload_success = device.upload_ino()
+                    logger.info("Sketch upload successful.") if upload_success else logger.error("Sketch upload failed.")
+
+                # Connect
+                logger.info(f"Connecting to {channel.name} ({device.port})...")
+                connect_success = device.connect()
+                logger.info("Device connected successfully.") if connect_success else logger.error(f"Device connection failed: {device.port}")
+                connected += 1 if connect_success else 0
+            self.is_device_connected = connected > 0
+
+            if connected == len(self.outputs):
                 logger.info("System is ready.")
+            elif self.is_device_connected:
+                logger.warning(f"Only {connected} of {len(self.outputs)} devices connected.")
             else:
                 logger.warning("System not ready - check device connection.")
                 
@@ -131,7 +134,7 @@ class TrayApp:
 
     
     def send_current_config_to_device(self):
-        if not hasattr(self, "device") or not self.device:
+        if not self.outputs:
             logger.warning("No device to send configuration to.")
             return
 
@@ -139,91 +142,81 @@ class TrayApp:
             logger.warning("No configuration data available.")
             return
 
-        try:
-            self.device.send_config()
-        except Exception as e:
-            logger.error(f"Failed to send configuration to Arduino: {e}")
+        for channel in self.outputs:
+            try:
+                channel.device.send_config()
+            except Exception as e:
+                logger.error(f"Failed to send configuration to Arduino ({channel.name}): {e}")
 
 
-    def create_queue_color_generator(self):
-        consecutive_empty = 0
-        
+    def create_mailbox_color_generator(self, channel, poll_interval=0.1):
+        """
+        Yield each new frame from the channel's mailbox as soon as it arrives, or None
+        after poll_interval without one. The writer sends nothing for None (the LEDs
+        hold the last frame) unless it is interpolating between frames.
+        """
         while self.running:
             try:
-                colors = self.color_queue.get(timeout=0.05)
-                self.color_queue.task_done()
-                consecutive_empty = 0
-                self.stats["frames_sent"] += 1
-                yield colors
-                
-            except queue.Empty:
-                consecutive_empty += 1
-                if consecutive_empty == 1:
-                    logger.debug("Color queue empty, sending black")
-                yield [(0, 0, 0)] * (self.device.expected_led_count or 1)
+                frame = channel.mailbox.get(timeout=poll_interval)
+                if frame is None:
+                    yield None
+                    continue
+                colors, captured_at, put_at = frame
+                channel.stats.record("queue_wait", time.perf_counter() - put_at)
+                channel.stats.increment("frames_sent")
+                yield TimedFrame(colors, captured_at)
                 
             except Exception as e:
-                logger.error(f"Queue generator error: {e}")
-                self.stats["send_errors"] += 1
-                yield [(0, 0, 0)] * (self.device.expected_led_count or 1)
+                logger.error(f"Mailbox generator error: {e}")
+                channel.stats.increment("send_errors")
 
 
-    def screen_capture_worker(self):
+    def screen_capture_worker(self, group):
+        """
+        Capture one monitor and feed every output attached to it.
+        """
         if not self.settings_ui.config:
             logger.error("No config available for capture worker")
             return
             
-        update_rate = self.settings_ui.config.get("update_rate_hz", 30)
-        interval = 1.0 / update_rate
+        governor = group.governor
+        interval = governor.interval
+        smoothing = ", ".join(sorted({channel.smoother.mode for channel in group.channels}))
         
-        logger.info(f"Screen capture worker started at {update_rate} FPS (interval: {interval:.3f}s)")
+        logger.info(f"Screen capture worker for {group.name} started at {governor.describe()} (mode: {group.capture_mode}, smoothing: {smoothing})")
         
         consecutive_errors = 0
         last_stats_log = time.time()
+        last_stats_snapshots = {channel.name: channel.stats.snapshot() for channel in group.channels}
         
         while self.running:
             frame_start = time.time()
+            interval = governor.interval
+            processed = False
             
             try:
-                # 1. Capture frame
-                frame = self.screen_capturer.capture_screen()
+                # 1. Capture frame, once for all outputs on this monitor
+                captured_at = time.perf_counter()
+                frame = group.capture()
                 if frame is None:
                     logger.warning("Screen capture failed")
                     consecutive_errors += 1
                     time.sleep(interval)
                     continue
+                extract_start = time.perf_counter()
+                consecutive_errors = 0
                 
-                # 2. Process colors
-                raw_colors = self.color_processor.get_led_colors(frame)
-                brightness_n = self.current_brightness / 100.0
-                colors = self.color_processor.adjust_and_correct_colors(
-                    colors=raw_colors, 
-                    brightness=brightness_n,
-                    min_brightness_clip=self.current_brightness_tolerance
-                )
-                
-                if not colors:
-                    colors = [(0, 0, 0)] * (self.device.expected_led_count or 1)
-                
-                # 3. Add to queue
-                try:
-                    while self.color_queue.qsize() >= self.color_queue.maxsize:
-                        try:
-                            self.color_queue.get_nowait()
-                            self.color_queue.task_done()
-                        except queue.Empty:
-                            break
-                    
-                    self.color_queue.put_nowait(colors)
-                    self.stats["frames_captured"] += 1
-                    consecutive_errors = 0
-                    
-                except queue.Full:
-                    logger.debug("Color queue full, dropping frame")
+                # 2. Extract, correct and hand off per output
+                for channel in group.channels:
+                    channel.capture_rate_hz = governor.rate_hz
+                    channel.stats.record("capture", extract_start - captured_at)
+                    if channel.process(frame, captured_at, time.perf_counter(), self.current_brightness, self.current_brightness_tolerance):
+                        processed = True
                 
             except Exception as e:
                 consecutive_errors += 1
-                self.stats["capture_errors"] += 1
+                for channel in group.channels:
+                    channel.stats.increment("capture_errors")
                 logger.error(f"Screen capture worker error #{consecutive_errors}: {e}")
                 
                 if consecutive_errors > 10:
@@ -231,34 +224,106 @@ class TrayApp:
                     break
             
             current_time = time.time()
-            if current_time - last_stats_log > 30:
-                elapsed = current_time - self.stats["last_stats_time"]
-                fps_captured = self.stats["frames_captured"] / elapsed if elapsed > 0 else 0
-                fps_sent = self.stats["frames_sent"] / elapsed if elapsed > 0 else 0
-                
-                logger.info(f"Stats: Captured {fps_captured:.1f} FPS, Sent {fps_sent:.1f} FPS, "
-                          f"Queue size: {self.color_queue.qsize()}, "
-                          f"Errors: {self.stats['capture_errors']} capture, {self.stats['send_errors']} send")
-                
-                # Reset stats
-                self.stats = {
-                    "frames_captured": 0,
-                    "frames_sent": 0,
-                    "capture_errors": 0,
-                    "send_errors": 0,
-                    "last_stats_time": current_time
-                }
+            if current_time - last_stats_log > STATS_LOG_INTERVAL:
+                for channel in group.channels:
+                    self.log_pipeline_stats(channel, since=last_stats_snapshots[channel.name])
+                    last_stats_snapshots[channel.name] = channel.stats.snapshot()
                 last_stats_log = current_time
             
             # Frame timing
             frame_time = time.time() - frame_start
+            governor.report_frame(frame_time if processed else None, group.motion_colors() if processed else None)
+            if self.profiler:
+                self.profiler.report_frame(frame_time, interval)
             sleep_time = max(0, interval - frame_time)
             if sleep_time > 0:
                 time.sleep(sleep_time)
             elif frame_time > interval * 1.5:
                 logger.debug(f"Capture frame took {frame_time:.3f}s (target: {interval:.3f}s)")
         
-        logger.info("Screen capture worker ended.")
+        group.capturer.close()
+        logger.info(f"Screen capture worker for {group.name} ended.")
+
+
+    def log_pipeline_stats(self, channel, since=None):
+        """
+        Log counters and per-stage p50/p95 of one output for the window since
+        `since` and write the same summary to its latency stats file.
+        """
+        path = LATENCY_STATS_FILE
+        prefix = ""
+        if len(self.outputs) > 1:
+            path = LATENCY_STATS_FILE.replace(".json", f"_{channel.name}.json")
+            prefix = f"[{channel.name}] "
+        try:
+            summary = channel.stats.dump_json(path, since=since)
+        except Exception as e:
+            logger.error(f"Failed to write latency stats: {e}")
+            summary = channel.stats.summary(since)
+
+        counters = summary["counters"]
+        def rate(name):
+            return counters.get(name, {}).get("per_second", 0.0)
+        def count(name):
+            return counters.get(name, {}).get("count", 0)
+
+        capture_rate = f"{channel.capture_rate_hz:.0f} Hz" if channel.capture_rate_hz else "n/a"
+        logger.info(f"{prefix}Stats: Capture rate {capture_rate}, Captured {rate('frames_captured'):.1f} FPS, Sent {rate('frames_sent'):.1f} FPS, "
+                    f"Overwritten: {count('frames_overwritten')}, "
+                    f"Unchanged: {count('frames_unchanged')}, "
+                    f"Errors: {count('capture_errors')} capture, {count('send_errors')} send")
+        logger.info(f"{prefix}Latency: {PipelineStats.format_summary(summary)}")
+
+
+    def process_pipeline_worker(self, channel):
+        """
+        Relay frames from the color worker process into the channel's mailbox.
+        Used instead of screen_capture_worker when color_pipeline is "process".
+        """
+        logger.info("Process pipeline relay started.")
+        last_stats_log = time.time()
+        last_stats_snapshot = channel.stats.snapshot()
+        reported_errors = 0
+        reported_unchanged = 0
+
+        while self.running:
+            try:
+                self.color_pipeline.set_controls(self.current_brightness / 100.0, self.current_brightness_tolerance)
+                frame = self.color_pipeline.read_frame(timeout=0.5)
+
+                errors = self.color_pipeline.errors
+                if errors > reported_errors:
+                    channel.stats.increment("capture_errors", errors - reported_errors)
+                    reported_errors = errors
+                channel.capture_rate_hz = self.color_pipeline.rate_hz
+                unchanged = self.color_pipeline.unchanged
+                if unchanged > reported_unchanged:
+                    channel.stats.increment("frames_unchanged", unchanged - reported_unchanged)
+                    reported_unchanged = unchanged
+
+                if frame is not None:
+                    colors, timings = frame
+                    for stage in ("capture", "extract", "correct"):
+                        if timings[stage] > 0:  # keepalive frames skip extract and correct
+                            channel.stats.record(stage, timings[stage])
+                    if channel.mailbox.put(colors, timings["captured_at"]):
+                        channel.stats.increment("frames_overwritten")
+                    channel.stats.increment("frames_captured")
+                elif not self.color_pipeline.is_alive():
+                    logger.error("Color worker process exited, stopping relay")
+                    break
+
+            except Exception as e:
+                logger.error(f"Process pipeline relay error: {e}")
+                time.sleep(0.1)
+
+            current_time = time.time()
+            if current_time - last_stats_log > STATS_LOG_INTERVAL:
+                self.log_pipeline_stats(channel, since=last_stats_snapshot)
+                last_stats_snapshot = channel.stats.snapshot()
+                last_stats_log = current_time
+
+        logger.info("Process pipeline relay ended.")
 
 
     def start_system(self):
@@ -269,53 +334,98 @@ class TrayApp:
         logger.info("System started.")
         self.running = True
         self.update_icon()
-        while not self.color_queue.empty():
-            try:
-                self.color_queue.get_nowait()
-                self.color_queue.task_done()
-            except queue.Empty:
-                break
+        for channel in self.outputs:
+            channel.reset()
         
-        self.capture_thread = threading.Thread(target=self.screen_capture_worker, daemon=True)
-        self.capture_thread.start()
-        
-        color_generator = self.create_queue_color_generator()
+        self.profiler = SamplingProfiler.from_config(self.settings_ui.config)
+        self.capture_threads = []
+        if self.settings_ui.config.get("color_pipeline", "thread") == "process":
+            if len(self.outputs) == 1:
+                try:
+                    self.color_pipeline = ProcessColorPipeline.from_config(self.config_path, self.outputs[0].name)
+                    self.color_pipeline.set_controls(self.current_brightness / 100.0, self.current_brightness_tolerance)
+                    self.color_pipeline.start()
+                    self.capture_threads.append(("process", threading.Thread(target=self.process_pipeline_worker, args=(self.outputs[0],), daemon=True)))
+                except Exception as e:
+                    logger.error(f"Failed to start color worker process, using capture thread: {e}")
+                    self._stop_color_pipeline()
+            else:
+                logger.warning("The process color pipeline drives a single output; using capture threads.")
+        if not self.capture_threads:
+            # One capture thread per monitor, so monitors are captured in parallel.
+            for group in self.capture_groups:
+                self.capture_threads.append((group.name, threading.Thread(target=self.screen_capture_worker, args=(group,), daemon=True)))
+        for _, thread in self.capture_threads:
+            thread.start()
         
-        update_rate = self.settings_ui.config.get("update_rate_hz", 30)
-        send_interval = 1.0 / (update_rate * 1.1)  # %10 faster (?)
+        for channel in self.outputs:
+            device = channel.device
+            if not (device.serial and device.serial.is_open):
+                logger.warning(f"Output {channel.name} is not connected, skipping.")
+                continue
+            # Each output captures at its own configured rate, so pace its writer to match.
+            governor = FrameRateGovernor.from_dict(channel.config)
+            update_rate = governor.max_hz if governor.enabled else governor.fixed_hz
+            send_interval = 1.0 / (update_rate * 1.1)  # %10 faster (?)
+            poll_interval = 0.1
+            if device.interpolation != "none":
+                # The writer produces in-between frames at the output rate, independent of capture.
+                send_interval = 1.0 / channel.config.get("output_rate_hz", 100)
+                poll_interval = send_interval
+            
+            color_generator = self.create_mailbox_color_generator(channel, poll_interval)
+            device.start_writing_loop(color_generator, interval=send_interval)
+            logger.info(f"Output {channel.name} ({device.port}) sending at up to {1/send_interval:.1f} Hz")
         
-        self.device.start_writing_loop(color_generator, interval=send_interval)
+        if self.profiler.enabled:
+            for name, thread in self.capture_threads:
+                self.profiler.watch(f"capture:{name}", thread)
+            for channel in self.outputs:
+                if channel.device.write_thread:
+                    self.profiler.watch(f"writer:{channel.name}", channel.device.write_thread)
+            logger.info("Sampling profiler armed; profiles are taken when frames miss their deadline.")
         
-        logger.info(f"System started with {update_rate} Hz capture, {1/send_interval:.1f} Hz send rate")
+        logger.info(f"System started with {governor.describe()} capture on {len(self.capture_groups)} monitor(s), {len(self.outputs)} output(s)")
 
 
     def stop_system(self):
         logger.info("System stopped.")
         self.running = False
         self.update_icon()
-        if hasattr(self, "device") and self.device:
-            self.device.stop_writing_loop()
+        if self.profiler:
+            self.profiler.stop()
+        for channel in self.outputs:
+            channel.mailbox.close()
+            channel.device.stop_writing_loop()
             try:
-                self.device.close_leds()
+                channel.device.close_leds()
             except Exception as e:
-                logger.error(f"Error closing LEDs: {e}")
-        
-        if self.capture_thread and self.capture_thread.is_alive():
-            logger.info("Waiting for capture thread to stop...")
-            self.capture_thread.join(timeout=3)
-            if self.capture_thread.is_alive():
-                logger.warning("Capture thread did not stop gracefully")
+                logger.error(f"Error closing LEDs ({channel.name}): {e}")
         
-        while not self.color_queue.empty():
-            try:
-                self.color_queue.get_nowait()
-                self.color_queue.task_done()
-            except queue.Empty:
-                break
+        self._join_capture_threads()
+        self._stop_color_pipeline()
                 
         logger.info("System stopped.")
 
 
+    def _join_capture_threads(self):
+        for name, thread in self.capture_threads:
+            if thread.is_alive():
+                logger.info(f"Waiting for capture thread {name} to stop...")
+                thread.join(timeout=3)
+                if thread.is_alive():
+                    logger.warning(f"Capture thread {name} did not stop gracefully")
+
+
+    def _stop_color_pipeline(self):
+        if self.color_pipeline:
+            try:
+                self.color_pipeline.stop()
+            except Exception as e:
+                logger.error(f"Error stopping color worker process: {e}")
+            self.color_pipeline = None
+
+
     def open_settings(self, _=None):
         self.root.after(0, self.settings_ui.show)
 
@@ -324,27 +434,25 @@ class TrayApp:
         logger.info("Quitting application...")
         self.running = False
 
-        if hasattr(self, "device") and self.device:
+        for channel in self.outputs:
+            device = channel.device
             try:
-                self.device.stop_writing_loop()
+                device.stop_writing_loop()
             except Exception as e:
                 logger.error(f"Error stopping write loop: {e}")
                 
             try:
-                self.device.close_leds()
+                device.close_leds()
             except Exception as e:
                 logger.error(f"Error closing LEDs during quit: {e}")
                 
             try:
-                self.device.disconnect()
+                device.disconnect()
             except Exception as e:
                 logger.error(f"Error disconnecting device: {e}")
 
-        if hasattr(self, "capture_thread") and self.capture_thread is not None and self.capture_thread.is_alive():
-            logger.info("Waiting for capture thread to stop...")
-            self.capture_thread.join(timeout=3)
-            if self.capture_thread.is_alive():
-                logger.warning("Capture thread did not stop gracefully")
+        self._join_capture_threads()
+        self._stop_color_pipeline()
 
         if self.tray_icon:
             try:
@@ -395,8 +503,8 @@ class TrayApp:
         if self.settings_ui.config_loaded:
             if self.running:
                 self.stop_system()
-                if hasattr(self, "device") and self.device:
-                    self.device.close_leds()
+                for channel in self.outputs:
+                    channel.device.close_leds()
             else:
                 self.start_system()
         else:
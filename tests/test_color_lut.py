@@ -0,0 +1,26 @@
+import time
+import numpy as np
+import pytest
+from engine.color_processor import ColorProcessor
+
+
+def wait_for_table(processor, brightness, min_brightness_clip, timeout=10):
+    gains = np.array([processor.coef_r, processor.coef_g, processor.coef_b], dtype=np.float32) * brightness
+    deadline = time.monotonic() + timeout
+    while not processor.color_lut.update(gains, min_brightness_clip):
+        assert time.monotonic() < deadline, "color LUT was not built in time"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize("size", [33, 256])
+def test_lut_matches_direct_path_before_and_after_rebuild(size):
+    colors = np.random.default_rng(1).integers(0, 256, (2000, 3)).astype(np.uint8)
+    direct = ColorProcessor({"top": 10}, coef_b=0.9)
+    with_lut = ColorProcessor({"top": 10}, coef_b=0.9, color_lut_size=size)
+
+    for brightness in (0.9, 0.5):
+        expected = direct.adjust_and_correct_colors(colors, brightness, 27)
+        # The first call after a change starts a background build and falls back to the direct path.
+        assert np.array_equal(with_lut.adjust_and_correct_colors(colors, brightness, 27), expected)
+        wait_for_table(with_lut, brightness, 27)
+        assert np.array_equal(with_lut.adjust_and_correct_colors(colors, brightness, 27), expected)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from engine.border_frame import BorderFrame
+from engine.color_processor import ColorProcessor
+from engine.letterbox import LetterboxDetector
+
+LED_CONFIG = {"top": 20, "right": 12, "bottom": 20, "left": 12}
+
+
+def letterboxed_frame(bars=140, band=40):
+    # A margin-wide (200, 50, 50) band just inside the bars around a blue picture,
+    # so sampling too deep shows up as well as sampling the bars.
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    frame[bars:1080 - bars] = (200, 50, 50)
+    frame[bars + band:1080 - bars - band, band:1920 - band] = (40, 40, 200)
+    return frame
+
+
+def capture_border(frame, margin):
+    border = BorderFrame(frame.shape, margin)
+    for name, top, left, height, width, _ in border.regions:
+        border.strip(name)[:] = frame[top:top + height, left:left + width]
+    return border
+
+
+def sample(quality, frame, capture=None, frames=4):
+    processor = ColorProcessor(LED_CONFIG, margin=40, sampling_quality=quality, letterbox=LetterboxDetector(interval=1, confirm_scans=1))
+    for _ in range(frames):
+        image = frame if capture is None else capture(frame, processor.capture_margin)
+        colors = processor.get_led_colors(image)
+    return colors.astype(int)
+
+
+@pytest.mark.parametrize("quality", ["balanced", "fast"])
+@pytest.mark.parametrize("capture", [None, capture_border], ids=["screen", "border"])
+def test_letterboxed_downscaled_modes_match_full_mode(quality, capture):
+    frame = letterboxed_frame()
+
+    full = sample("full", frame, capture)
+    downscaled = sample(quality, frame, capture)
+
+    assert np.abs(full - (200, 50, 50)).max() <= 1
+    assert np.abs(downscaled - full).max() <= 1
+
+
+def test_letterboxed_border_deeper_than_needed():
+    frame = letterboxed_frame()
+    deeper = lambda frame, margin: capture_border(frame, margin + 37)
+
+    assert np.abs(sample("fast", frame, deeper) - sample("full", frame)).max() <= 1
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from engine.border_frame import BorderFrame
+from engine.color_processor import ColorProcessor
+
+LED_CONFIG = {"top": 10, "right": 6, "bottom": 10, "left": 6}
+
+
+def banded_frame(shape, band):
+    # A band-wide red edge around a blue interior: sampling deeper than the margin pulls in blue.
+    frame = np.zeros(shape + (3,), dtype=np.uint8)
+    frame[:] = (255, 0, 0)
+    frame[band:-band, band:-band] = (0, 0, 255)
+    return frame
+
+
+def capture_border(frame, margin):
+    border = BorderFrame(frame.shape, margin)
+    for name, top, left, height, width, _ in border.regions:
+        border.strip(name)[:] = frame[top:top + height, left:left + width]
+    return border
+
+
+@pytest.mark.parametrize("shape, margin", [((2160, 3840), 10), ((1080, 1920), 10), ((1080, 1920), 40)])
+@pytest.mark.parametrize("quality", ["balanced", "fast"])
+@pytest.mark.parametrize("border", [False, True], ids=["screen", "border"])
+def test_downscaled_modes_sample_the_configured_margin(shape, margin, quality, border):
+    frame = banded_frame(shape, margin)
+    image = capture_border(frame, margin) if border else frame
+
+    full = ColorProcessor(LED_CONFIG, margin=margin).get_led_colors(image).astype(int)
+    downscaled = ColorProcessor(LED_CONFIG, margin=margin, sampling_quality=quality).get_led_colors(image).astype(int)
+
+    assert full[:, 0].min() >= 250
+    assert np.abs(downscaled - full).max() <= 2
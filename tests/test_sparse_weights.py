@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from engine.sampling_plan import SparseWeights
+
+
+def dense_reference(rows, image):
+    pixels = image.reshape(-1, 3).astype(np.float64)
+    colors = np.zeros((len(rows), 3))
+    for led, (indices, weights) in enumerate(rows):
+        if len(indices):
+            colors[led] = (pixels[indices] * np.asarray(weights)[:, None]).sum(axis=0)
+    return np.clip(colors, 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize("row_lengths", [
+    [1, 8, 0],
+    [0, 1, 8, 0, 0],
+    [3, 0, 50, 2, 0],
+    [0, 0, 5],
+    [4, 4, 4, 4]
+])
+def test_apply_matches_dense_reference(row_lengths):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 256, (20, 20, 3), dtype=np.uint8)
+    rows = [(rng.integers(0, 400, length), np.full(length, 1.0 / max(1, length))) for length in row_lengths]
+
+    matrix = SparseWeights.from_rows(rows)
+
+    assert np.array_equal(matrix.apply(image), dense_reference(rows, image))
+
+
+def test_trailing_empty_row_uses_reduceat_path():
+    rows = [(np.array([0]), np.array([1.0])), (np.arange(1, 9), np.full(8, 1 / 8)), (np.zeros(0, dtype=np.intp), np.zeros(0))]
+    image = np.arange(3 * 3 * 3, dtype=np.uint8).reshape(3, 3, 3) * 9
+
+    matrix = SparseWeights.from_rows(rows)
+
+    assert not matrix.padded
+    assert np.array_equal(matrix.apply(image), dense_reference(rows, image))
+    assert np.array_equal(matrix.apply(image)[2], [0, 0, 0])
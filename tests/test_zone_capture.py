@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from engine.border_frame import BorderFrame
+from engine.color_processor import ColorProcessor
+from engine.zone_layout import ZoneLayout
+
+
+def capture(frame, margin):
+    if margin is None:
+        return frame
+    border = BorderFrame(frame.shape, margin)
+    for name, top, left, height, width, _ in border.regions:
+        border.strip(name)[:] = frame[top:top + height, left:left + width]
+    return border
+
+
+@pytest.mark.parametrize("inner_zone", [
+    {"rect": [0.2, 0.1, 0.3, 0.2]},
+    {"rect": [0.45, 0.45, 0.55, 0.55]}
+], ids=["ring", "center"])
+def test_zones_inside_the_frame_are_captured(inner_zone):
+    frame = np.random.default_rng(0).integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+    zones = [{"rect": [0.0, 0.0, 0.1, 0.05]}, inner_zone]
+    expected = ColorProcessor({}, zone_layout=ZoneLayout(zones)).get_led_colors(frame)
+    processor = ColorProcessor({}, zone_layout=ZoneLayout(zones))
+
+    for _ in range(3):
+        colors = processor.get_led_colors(capture(frame, processor.capture_margin))
+        assert np.array_equal(colors, expected)
@@ -0,0 +1,252 @@
+"""
+Synthetic-frame benchmark for ColorProcessor (and ScreenCapturer when a display is available).
+
+    python -m tools.benchmark_color --resolutions 1080p,4k --repeat 30
+    python -m tools.benchmark_color --compare logs/benchmarks/color_20250101-120000.json
+    python -m tools.benchmark_color --color-modes mean,dominant,saturated
+
+Every case times these stages on generated frames:
+    plan_build     first get_led_colors call for a new frame size (builds the sampling plan)
+    extract_full   get_led_colors on a full RGB frame
+    extract_border get_led_colors on a BorderFrame holding only the edge strips
+    correct        adjust_and_correct_colors on the extracted colors
+and reports the median time, the peak memory allocated per call and the
+number of allocations per call that are still alive after it returns (its
+results and anything it caches), both from tracemalloc. Temporaries freed
+inside the call only show up in the peak, since tracemalloc keeps no count
+of freed blocks.
+Results are written as JSON so later runs can be compared with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from engine.border_frame import BorderFrame
+from engine.color_processor import ColorProcessor
+from tools.logger import setup_logger
+
+logger = setup_logger("BenchmarkColor")
+
+RESOLUTIONS = {
+    "720p": (720, 1280),
+    "1080p": (1080, 1920),
+    "1440p": (1440, 2560),
+    "4k": (2160, 3840),
+    "8k": (4320, 7680)
+}
+
+LED_CONFIGS = {
+    "small": {"top": 10, "right": 6, "bottom": 10, "left": 6},
+    "default": {"top": 31, "right": 18, "bottom": 31, "left": 18},
+    "dense": {"top": 60, "right": 34, "bottom": 60, "left": 34}
+}
+
+
+def make_frame(pattern, shape, seed=0):
+    h, w = shape
+    if pattern == "solid":
+        return np.full((h, w, 3), (200, 80, 30), dtype=np.uint8)
+
+    if pattern == "gradient":
+        x = np.linspace(0, 255, w, dtype=np.float32)[None, :]
+        y = np.linspace(0, 255, h, dtype=np.float32)[:, None]
+        frame = np.empty((h, w, 3), dtype=np.uint8)
+        frame[:, :, 0] = np.broadcast_to(x, (h, w))
+        frame[:, :, 1] = np.broadcast_to(y, (h, w))
+        frame[:, :, 2] = np.broadcast_to((x + y) / 2, (h, w))
+        return frame
+
+    if pattern == "noise":
+        # Video-like: smooth large-scale structure plus fine grain.
+        rng = np.random.default_rng(seed)
+        coarse = rng.integers(0, 256, (max(1, h // 64), max(1, w // 64), 3), dtype=np.uint8)
+        frame = cv2.resize(coarse, (w, h), interpolation=cv2.INTER_CUBIC)
+        grain = rng.integers(-12, 13, (h, w, 3), dtype=np.int16)
+        return np.clip(frame.astype(np.int16) + grain, 0, 255).astype(np.uint8)
+
+    raise ValueError(f"Unknown pattern '{pattern}'")
+
+
+def border_frame_from(frame, margin):
+    border = BorderFrame(frame.shape, margin)
+    for name, top, left, height, width, _ in border.regions:
+        border.strip(name)[:] = frame[top:top + height, left:left + width]
+    return border
+
+
+def measure(stage, repeat):
+    """
+    Returns (median seconds, peak bytes allocated during one call,
+    allocations per call still alive after it).
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    stage()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+
+    # Keep every result alive so its blocks are counted, then compare block counts.
+    results = []
+    before = tracemalloc.take_snapshot()
+    for _ in range(repeat):
+        results.append(stage())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    new_blocks = sum(max(0, stat.count_diff) for stat in after.compare_to(before, "filename"))
+    # The results list itself is one block (resized a few times).
+    return float(np.median(times)), int(peak), max(0.0, (new_blocks - 1) / repeat)
+
+
+def run_case(frame, pattern, resolution, led_name, margin, enable_corners, quality, repeat, color_mode="mean"):
+    processor = ColorProcessor(LED_CONFIGS[led_name], margin=margin, enable_corners=enable_corners, sampling_quality=quality, color_mode=color_mode)
+    border = border_frame_from(frame, margin)
+
+    start = time.perf_counter()
+    colors = processor.get_led_colors(frame)
+    plan_build = time.perf_counter() - start
+    processor.get_led_colors(border)
+
+    stages = {"plan_build": {"ms": plan_build * 1000, "peak_kb": None, "allocs": None}}
+    for name, stage in (
+        ("extract_full", lambda: processor.get_led_colors(frame)),
+        ("extract_border", lambda: processor.get_led_colors(border)),
+        ("correct", lambda: processor.adjust_and_correct_colors(colors, brightness=0.89, min_brightness_clip=27)),
+    ):
+        seconds, peak, allocs = measure(stage, repeat)
+        stages[name] = {"ms": seconds * 1000, "peak_kb": peak / 1024, "allocs": allocs}
+
+    key = f"{resolution}/{pattern}/{led_name}/m{margin}/{'corners' if enable_corners else 'nocorners'}/{quality}"
+    if color_mode != "mean":
+        key += f"/{color_mode}"
+    return {
+        "key": key,
+        "resolution": resolution,
+        "pattern": pattern,
+        "led_config": led_name,
+        "margin": margin,
+        "enable_corners": enable_corners,
+        "sampling_quality": quality,
+        "color_mode": color_mode,
+        "stages": stages
+    }
+
+
+def run_capture(repeat, margin):
+    """
+    Time the real ScreenCapturer; skipped when no display is available.
+    """
+    try:
+        from engine.screen_capture import ScreenCapturer
+        capturer = ScreenCapturer()
+        if capturer.capture_screen() is None:
+            return None
+    except Exception as e:
+        logger.warning(f"Skipping capture benchmark: {e}")
+        return None
+
+    stages = {}
+    for name, stage in (
+        ("capture_full", capturer.capture_screen),
+        ("capture_border", lambda: capturer.capture_border(margin)),
+    ):
+        seconds, peak, allocs = measure(stage, repeat)
+        stages[name] = {"ms": seconds * 1000, "peak_kb": peak / 1024, "allocs": allocs}
+    capturer.close()
+    return {"key": f"capture/m{margin}", "stages": stages}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor()
+    }
+
+
+def print_results(results, previous=None):
+    previous_stages = {}
+    if previous:
+        previous_stages = {case["key"]: case["stages"] for case in previous["cases"]}
+
+    for case in results:
+        parts = []
+        for name, stage in case["stages"].items():
+            text = f"{name}={stage['ms']:.3f}ms"
+            if stage.get("peak_kb") is not None:
+                text += f"/{stage['peak_kb']:.0f}KB"
+            if stage.get("allocs") is not None:
+                text += f"/{stage['allocs']:.1f}allocs"
+            old = previous_stages.get(case["key"], {}).get(name)
+            if old and old["ms"] > 0:
+                text += f" ({stage['ms'] / old['ms']:.2f}x)"
+            parts.append(text)
+        print(f"{case['key']:<48} " + "  ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ColorProcessor on synthetic frames.")
+    parser.add_argument("--resolutions", default="720p,1080p,1440p,4k,8k", help=f"comma separated: {','.join(RESOLUTIONS)}")
+    parser.add_argument("--patterns", default="solid,gradient,noise", help="comma separated: solid, gradient, noise")
+    parser.add_argument("--leds", default="small,default,dense", help=f"comma separated: {','.join(LED_CONFIGS)}")
+    parser.add_argument("--margins", default="10,40", help="comma separated margins")
+    parser.add_argument("--corners", default="false,true", help="comma separated enable_corners values")
+    parser.add_argument("--quality", default="full", help="comma separated sampling_quality values")
+    parser.add_argument("--color-modes", default="mean", help="comma separated color_mode values: mean, dominant, saturated")
+    parser.add_argument("--repeat", type=int, default=20, help="timed calls per stage")
+    parser.add_argument("--capture", action="store_true", help="also time the real ScreenCapturer")
+    parser.add_argument("--output", default=None, help="result file (default logs/benchmarks/color_<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    results = []
+    for resolution in args.resolutions.split(","):
+        for pattern in args.patterns.split(","):
+            frame = make_frame(pattern, RESOLUTIONS[resolution])
+            for led_name in args.leds.split(","):
+                for margin in [int(v) for v in args.margins.split(",")]:
+                    for enable_corners in [v.strip().lower() == "true" for v in args.corners.split(",")]:
+                        for quality in args.quality.split(","):
+                            for color_mode in args.color_modes.split(","):
+                                case = run_case(frame, pattern, resolution, led_name, margin, enable_corners, quality, args.repeat, color_mode)
+                                results.append(case)
+                                print_results([case], previous)
+
+    if args.capture:
+        case = run_capture(args.repeat, int(args.margins.split(",")[0]))
+        if case:
+            results.append(case)
+            print_results([case], previous)
+
+    output = args.output or os.path.join("logs", "benchmarks", f"color_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"environment": environment(), "cases": results}, f, indent=4)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+End-to-end throughput benchmark for DeviceInterface against the simulated board.
+
+    python -m tools.benchmark_device --leds 32,98,150,250 --baud 250000,1000000
+
+A producer thread renders frames at --fps into a single latest-frame slot; the
+DeviceInterface writer loop sends whatever is newest. LED 0 carries a frame id
+so the simulated board can report when each frame was actually shown.
+"""
+import argparse
+import threading
+import time
+import numpy as np
+from engine.device_interface import DeviceInterface
+from engine.frame_mailbox import FrameMailbox
+from tools import protocol_arduinosim
+from tools.logger import setup_logger
+
+logger = setup_logger("BenchmarkDevice")
+
+
+class FrameSource:
+    """
+    Produces frames at a fixed rate and hands the writer only the newest one.
+    """
+
+    def __init__(self, led_count, fps, content="motion", seed=0):
+        self.led_count = led_count
+        self.interval = 1.0 / fps
+        self.content = content
+        self.rng = np.random.default_rng(seed)
+        self.created_at = {}
+        self.frames_produced = 0
+        self.running = False
+        self.mailbox = FrameMailbox()
+        self._last_frame = None
+        self._thread = None
+
+
+    def _render(self, frame_id):
+        if self.content == "motion" or self._last_frame is None:
+            frame = self.rng.integers(0, 256, (self.led_count, 3), dtype=np.uint8)
+        else:
+            frame = self._last_frame.copy()
+        frame[0] = ((frame_id >> 16) & 0xFF, (frame_id >> 8) & 0xFF, frame_id & 0xFF)
+        self._last_frame = frame
+        return frame
+
+
+    def _produce(self):
+        next_frame = time.perf_counter()
+        frame_id = 0
+        while self.running:
+            frame_id += 1
+            frame = self._render(frame_id)
+            self.created_at[frame_id] = time.perf_counter()
+            self.frames_produced += 1
+            self.mailbox.put(frame, self.created_at[frame_id])
+
+            next_frame += self.interval
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+
+
+    def start(self):
+        self.running = True
+        self.mailbox.open()
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+
+    def stop(self):
+        self.running = False
+        self.mailbox.close()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+
+    def generator(self):
+        while self.running:
+            frame = self.mailbox.get(timeout=0.1)
+            if frame is not None:
+                yield frame[0]
+
+
+def run_case(led_count, baudrate, fps, duration, compression, content):
+    url = f"arduinosim://?leds={led_count}"
+    device = DeviceInterface(port=url, baudrate=baudrate, led_pin=7, update_rate=fps, version=1, frame_compression=compression)
+    device.expected_led_count = led_count
+    if not device.connect(max_wait=1, ready_timeout=2):
+        raise RuntimeError(f"Could not connect to {url}")
+
+    source = FrameSource(led_count, fps, content)
+    shown = []
+
+    def on_show(leds, timestamp):
+        if len(leds) < 3:
+            return
+        frame_id = (int(leds[0]) << 16) | (int(leds[1]) << 8) | int(leds[2])
+        shown.append((frame_id, time.perf_counter()))
+
+    device.serial.on_show = on_show
+    source.start()
+    device.start_writing_loop(source.generator(), interval=0)
+    time.sleep(duration)
+    source.stop()
+    device.stop_writing_loop()
+    board = device.serial
+    device.disconnect()
+
+    shown = [(frame_id, shown_at) for frame_id, shown_at in shown if frame_id in source.created_at]
+    latencies = [shown_at - source.created_at[frame_id] for frame_id, shown_at in shown]
+    unique_shown = len({frame_id for frame_id, _ in shown})
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "leds": led_count,
+        "baud": baudrate,
+        "compression": compression,
+        "content": content,
+        "fps": unique_shown / duration,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "dropped": source.frames_produced - unique_shown,
+        "errors": board.frames_failed,
+        "ack_timeouts": device.ack_timeouts
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DeviceInterface against a simulated Arduino.")
+    parser.add_argument("--leds", default="32,98,150,250", help="comma separated LED counts")
+    parser.add_argument("--baud", default="115200,250000,500000,1000000", help="comma separated baud rates")
+    parser.add_argument("--fps", type=float, default=120, help="frame production rate")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per case")
+    parser.add_argument("--compression", default="none,delta", help="comma separated frame_compression values")
+    parser.add_argument("--content", default="motion,static", help="comma separated: motion (all LEDs change) or static")
+    args = parser.parse_args()
+
+    protocol_arduinosim.register()
+
+    header = f"{'leds':>5} {'baud':>8} {'compr':>6} {'content':>7} {'fps':>7} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'dropped':>8} {'errors':>6} {'ack t/o':>7}"
+    print(header)
+    print("-" * len(header))
+    for led_count in [int(v) for v in args.leds.split(",")]:
+        for baudrate in [int(v) for v in args.baud.split(",")]:
+            for compression in args.compression.split(","):
+                for content in args.content.split(","):
+                    r = run_case(led_count, baudrate, args.fps, args.duration, compression, content)
+                    print(f"{r['leds']:>5} {r['baud']:>8} {r['compression']:>6} {r['content']:>7} {r['fps']:>7.1f} "
+                          f"{r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} {r['p99_ms']:>7.1f} {r['dropped']:>8} {r['errors']:>6} {r['ack_timeouts']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import bisect
+import collections
+import json
+import os
+import time
+
+# Upper bucket edges in milliseconds: 0.05 ms to ~3.3 s, four buckets per doubling.
+BUCKET_EDGES_MS = [0.05 * 2 ** (i / 4) for i in range(65)]
+
+PIPELINE_STAGES = ("capture", "extract", "correct", "queue_wait", "serial_write", "ack", "glass_to_led")
+
+
+class LatencyHistogram:
+    """
+    Log-bucketed latency histogram. Counters only ever grow, so one thread can
+    record while others read snapshots without a lock; windows are taken by
+    subtracting an earlier snapshot instead of resetting.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_EDGES_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+
+    def record(self, seconds):
+        ms = seconds * 1000.0
+        self.buckets[bisect.bisect_left(BUCKET_EDGES_MS, ms)] += 1
+        self.total_ms += ms
+        self.count += 1
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+
+    def snapshot(self):
+        return {
+            "buckets": list(self.buckets),
+            "count": self.count,
+            "total_ms": self.total_ms,
+            "max_ms": self.max_ms
+        }
+
+
+def _percentile(buckets, count, fraction):
+    if count == 0:
+        return None
+    target = fraction * count
+    seen = 0
+    for index, bucket_count in enumerate(buckets):
+        seen += bucket_count
+        if seen >= target:
+            return BUCKET_EDGES_MS[min(index, len(BUCKET_EDGES_MS) - 1)]
+    return BUCKET_EDGES_MS[-1]
+
+
+class PipelineStats:
+    """
+    Per-stage latency histograms and event counters for the capture -> serial pipeline.
+
+    Each stage is recorded by a single thread (capture worker, writer or reader),
+    so recording never takes a lock. Use snapshot() and summary(since=...) to
+    look at a window of activity.
+    """
+
+    def __init__(self, stages=PIPELINE_STAGES):
+        self.histograms = {stage: LatencyHistogram() for stage in stages}
+        self.counters = collections.defaultdict(int)
+        self.created_at = time.monotonic()
+
+
+    def record(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is not None:
+            histogram.record(seconds)
+
+
+    def increment(self, counter, amount=1):
+        self.counters[counter] += amount
+
+
+    def snapshot(self):
+        return {
+            "time": time.monotonic(),
+            "stages": {stage: histogram.snapshot() for stage, histogram in self.histograms.items()},
+            "counters": dict(self.counters)
+        }
+
+
+    def summary(self, since=None):
+        """
+        Count, mean, p50/p95/p99 and rates for the window between `since`
+        (an earlier snapshot) and now; the whole session if since is None.
+        """
+        current = self.snapshot()
+        start_time = since["time"] if since else self.created_at
+        elapsed = max(1e-9, current["time"] - start_time)
+
+        stages = {}
+        for stage, now in current["stages"].items():
+            before = since["stages"].get(stage) if since else None
+            buckets = now["buckets"]
+            count = now["count"]
+            total_ms = now["total_ms"]
+            if before:
+                buckets = [a - b for a, b in zip(buckets, before["buckets"])]
+                count -= before["count"]
+                total_ms -= before["total_ms"]
+            stages[stage] = {
+                "count": count,
+                "mean_ms": total_ms / count if count else None,
+                "p50_ms": _percentile(buckets, count, 0.50),
+                "p95_ms": _percentile(buckets, count, 0.95),
+                "p99_ms": _percentile(buckets, count, 0.99),
+                "session_max_ms": now["max_ms"]
+            }
+
+        counters = {}
+        for name, value in current["counters"].items():
+            delta = value - (since["counters"].get(name, 0) if since else 0)
+            counters[name] = {"count": delta, "per_second": delta / elapsed}
+
+        return {"elapsed_s": elapsed, "stages": stages, "counters": counters}
+
+
+    def dump_json(self, path, since=None):
+        summary = self.summary(since)
+        summary["written_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(summary, f, indent=4)
+        os.replace(temp_path, path)
+        return summary
+
+
+    @staticmethod
+    def format_summary(summary):
+        parts = []
+        for stage, values in summary["stages"].items():
+            if values["count"]:
+                parts.append(f"{stage} p50={values['p50_ms']:.2f} p95={values['p95_ms']:.2f}ms")
+        return ", ".join(parts)
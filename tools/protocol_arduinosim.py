@@ -0,0 +1,349 @@
+"""
+pyserial URL handler that stands in for the sketch in arduino/arduino_template.tmpl.
+
+    arduinosim://?leds=98&boot=0&reset=1&drop=1
+
+    leds   LED count the simulated board starts with (default 98)
+    boot   seconds between opening the port and READY (default 0)
+    reset  1 if opening the port resets the board and sends READY,
+           0 if the board keeps running and only answers 't' (default 1)
+    drop   1 to lose bytes that arrive while FastLED.show() has
+           interrupts disabled, like the real board (default 1)
+    delta  1 to understand 'c' frames and advertise them in the 't' reply,
+           0 to behave like a sketch from before delta frames (default 1)
+
+Call register() once, then use the URL as the serial_port of a DeviceInterface.
+Bytes take 10 bits of wire time each way at the configured baud rate, and
+every shown frame takes the WS2812B show time.
+"""
+import collections
+import struct
+import threading
+import time
+import urllib.parse
+import numpy as np
+import serial
+from serial.serialutil import SerialBase, SerialException, PortNotOpenError, to_bytes
+
+CONFIG_STRUCT_FORMAT = "<BBIBB"
+SERIAL_BITS_PER_BYTE = 10
+LED_SHOW_SECONDS_PER_LED = 30e-6
+LED_LATCH_SECONDS = 50e-6
+READ_TIMEOUT = 1.0  # same as the sketch's 1000 ms frame timeout
+
+
+def register():
+    if "tools" not in serial.protocol_handler_packages:
+        serial.protocol_handler_packages.append("tools")
+
+
+class Serial(SerialBase):
+    """
+    Simulated Arduino running the ambilight sketch, behind a pyserial interface.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.led_count = 98
+        self.boot_delay = 0.0
+        self.reset_on_open = True
+        self.drop_during_show = True
+        self.delta_frames = True
+        self.leds = np.zeros(self.led_count * 3, dtype=np.uint8)
+        self.on_show = None  # callback(leds, timestamp) after every shown frame
+        self.frames_shown = 0
+        self.frames_failed = 0
+        self.bytes_dropped = 0
+        self._lock = threading.Condition()
+        self._to_device = collections.deque()  # (arrival_time, byte)
+        self._to_host = collections.deque()
+        self._host_line_free_at = 0.0
+        self._device_line_free_at = 0.0
+        self._cancel = False
+        self._device_thread = None
+        self._last_arrival = 0.0
+        super().__init__(*args, **kwargs)
+
+
+    def from_url(self, url):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme != "arduinosim":
+            raise SerialException(f"Expected an arduinosim:// URL, got {url!r}")
+        options = urllib.parse.parse_qs(parts.query)
+        try:
+            self.led_count = int(options.get("leds", [self.led_count])[0])
+            self.boot_delay = float(options.get("boot", [self.boot_delay])[0])
+            self.reset_on_open = options.get("reset", ["1"])[0] != "0"
+            self.drop_during_show = options.get("drop", ["1"])[0] != "0"
+            self.delta_frames = options.get("delta", ["1"])[0] != "0"
+        except ValueError as e:
+            raise SerialException(f"Invalid arduinosim:// option: {e}")
+        self.leds = np.zeros(self.led_count * 3, dtype=np.uint8)
+
+
+    def open(self):
+        if self.is_open:
+            raise SerialException("Port is already open.")
+        if self._port is None:
+            raise SerialException("Port must be configured before it can be used.")
+        self.from_url(self.port)
+        self._reconfigure_port()
+        with self._lock:
+            self._to_device.clear()
+            self._to_host.clear()
+            self._cancel = False
+        self.is_open = True
+        self._device_thread = threading.Thread(target=self._run_device, daemon=True)
+        self._device_thread.start()
+
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            with self._lock:
+                self._lock.notify_all()
+            if self._device_thread and self._device_thread is not threading.current_thread():
+                self._device_thread.join(timeout=2)
+        super().close()
+
+
+    def _reconfigure_port(self):
+        if not isinstance(self._baudrate, int) or self._baudrate <= 0:
+            raise ValueError(f"invalid baudrate: {self._baudrate!r}")
+
+
+    def _update_dtr_state(self):
+        pass
+
+
+    def _update_rts_state(self):
+        pass
+
+
+    def _update_break_state(self):
+        pass
+
+
+    # Host side
+
+    def _byte_time(self):
+        return SERIAL_BITS_PER_BYTE / self._baudrate
+
+
+    @property
+    def in_waiting(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for arrival, _ in self._to_host if arrival <= now)
+
+
+    @property
+    def out_waiting(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for arrival, _ in self._to_device if arrival > now)
+
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise PortNotOpenError()
+        data = self._receive(self._to_host, size, self._timeout, host=True)
+        return bytes(data)
+
+
+    def write(self, data):
+        if not self.is_open:
+            raise PortNotOpenError()
+        data = to_bytes(data)
+        with self._lock:
+            self._host_line_free_at = self._transmit(self._to_device, data, self._host_line_free_at)
+        return len(data)
+
+
+    def flush(self):
+        while self.is_open and self.out_waiting:
+            time.sleep(self._byte_time())
+
+
+    def cancel_read(self):
+        with self._lock:
+            self._cancel = True
+            self._lock.notify_all()
+
+
+    def reset_input_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        now = time.monotonic()
+        with self._lock:
+            while self._to_host and self._to_host[0][0] <= now:
+                self._to_host.popleft()
+
+
+    def reset_output_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        now = time.monotonic()
+        with self._lock:
+            self._to_device = collections.deque(item for item in self._to_device if item[0] <= now)
+
+
+    # Wire model
+
+    def _transmit(self, line, data, line_free_at):
+        # Caller holds the lock. Returns when the line is free again.
+        arrival = max(time.monotonic(), line_free_at)
+        byte_time = self._byte_time()
+        for byte in data:
+            arrival += byte_time
+            line.append((arrival, byte))
+        self._lock.notify_all()
+        return arrival
+
+
+    def _receive(self, line, size, timeout, host=False):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        data = bytearray()
+        with self._lock:
+            while len(data) < size and self.is_open:
+                now = time.monotonic()
+                while line and line[0][0] <= now and len(data) < size:
+                    arrival, byte = line.popleft()
+                    data.append(byte)
+                    if not host:
+                        self._last_arrival = arrival
+                if len(data) >= size:
+                    break
+                if host and self._cancel:
+                    self._cancel = False
+                    break
+                if deadline is not None and now >= deadline:
+                    break
+
+                wait = None if deadline is None else deadline - now
+                if line:
+                    next_arrival = line[0][0] - now
+                    wait = next_arrival if wait is None else min(wait, next_arrival)
+                self._lock.wait(wait)
+        return data
+
+
+    # Device side
+
+    def _device_read(self, count, timeout=READ_TIMEOUT):
+        return self._receive(self._to_device, count, timeout)
+
+
+    def _device_available(self):
+        now = time.monotonic()
+        with self._lock:
+            return sum(1 for arrival, _ in self._to_device if arrival <= now)
+
+
+    def _device_drain(self):
+        self._device_read(self._device_available(), timeout=0)
+
+
+    def _device_println(self, text):
+        with self._lock:
+            self._device_line_free_at = self._transmit(self._to_host, (text + "\r\n").encode(), self._device_line_free_at)
+
+
+    def _show(self):
+        # The show starts when the last byte of the frame arrived on the wire,
+        # independent of when this thread got scheduled.
+        show_start = self._last_arrival
+        show_end = show_start + self.led_count * LED_SHOW_SECONDS_PER_LED + LED_LATCH_SECONDS
+        time.sleep(max(0.0, show_end - time.monotonic()))
+
+        if self.drop_during_show:
+            with self._lock:
+                kept = collections.deque(item for item in self._to_device if not show_start <= item[0] < show_end)
+                self.bytes_dropped += len(self._to_device) - len(kept)
+                self._to_device = kept
+
+        self.frames_shown += 1
+        if self.on_show:
+            self.on_show(self.leds, show_end)
+
+
+    def _frame_error(self, message):
+        self.frames_failed += 1
+        self._device_println(f"ERROR: {message}")
+        self._device_drain()
+
+
+    def _read_full_frame(self):
+        expected = self.led_count * 3
+        data = self._device_read(expected)
+        if len(data) != expected:
+            self._frame_error(f"{len(data)}/{expected}")
+            return
+        self.leds[:] = np.frombuffer(bytes(data), dtype=np.uint8)
+        self._show()
+        self._device_println("OK")
+
+
+    def _read_delta_frame(self):
+        header = self._device_read(1)
+        if len(header) != 1:
+            self._frame_error("Delta header timeout")
+            return
+        for _ in range(header[0]):
+            bounds = self._device_read(2)
+            if len(bounds) != 2:
+                self._frame_error("Delta range timeout")
+                return
+            start, length = bounds
+            if start + length > self.led_count:
+                self._frame_error("Delta range out of bounds")
+                return
+            data = self._device_read(length * 3)
+            if len(data) != length * 3:
+                self._frame_error("Delta data timeout")
+                return
+            self.leds[start * 3:(start + length) * 3] = np.frombuffer(bytes(data), dtype=np.uint8)
+        self._show()
+        self._device_println("OK")
+
+
+    def _read_config(self):
+        size = struct.calcsize(CONFIG_STRUCT_FORMAT)
+        data = self._device_read(size)
+        if len(data) != size:
+            self._device_println("ERROR: Config data timeout!")
+            self._device_drain()
+            return
+        _, led_count, _, _, _ = struct.unpack(CONFIG_STRUCT_FORMAT, bytes(data))
+        self.led_count = led_count
+        self.leds = np.zeros(led_count * 3, dtype=np.uint8)
+        self._device_println("CONFIG_SAVED")
+
+
+    def _run_device(self):
+        if self.reset_on_open:
+            boot_end = time.monotonic() + self.boot_delay
+            while self.is_open and time.monotonic() < boot_end:
+                time.sleep(0.01)
+            self._device_drain()
+            self._device_println("READY")
+
+        while self.is_open:
+            command = self._device_read(1, timeout=0.1)
+            if not command:
+                continue
+
+            command = chr(command[0])
+            if command == 'd':
+                self._read_full_frame()
+            elif command == 'c' and self.delta_frames:
+                self._read_delta_frame()
+            elif command == 'w':
+                self._read_config()
+            elif command == 't':
+                self._device_println("ALIVE delta" if self.delta_frames else "ALIVE")
+            else:
+                self._device_drain()
@@ -0,0 +1,134 @@
+"""
+Opt-in sampling profiler for the capture worker and the DeviceInterface writer.
+
+Enable with "profiling_enabled": true in config.json or AMBILIGHT_PROFILE=1.
+Nothing is sampled until frames start missing their deadline; then the watched
+threads' stacks are sampled for a few seconds and written in collapsed-stack
+format (one "thread;outer;...;inner count" line per stack) to logs/profiles/,
+ready for flamegraph.pl, speedscope or inferno.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+from tools.logger import setup_logger
+
+logger = setup_logger("SamplingProfiler")
+
+PROFILE_ENV_VAR = "AMBILIGHT_PROFILE"
+PROFILE_DIR = "logs/profiles"
+
+
+class SamplingProfiler:
+    def __init__(self, enabled=False, sample_interval=0.005, duration=10.0, miss_threshold=5,
+                 miss_window=2.0, cooldown=60.0, output_dir=PROFILE_DIR):
+        self.enabled = enabled
+        self.sample_interval = sample_interval
+        self.duration = duration
+        self.miss_threshold = miss_threshold  # missed deadlines within miss_window that trigger a profile
+        self.miss_window = miss_window
+        self.cooldown = cooldown  # minimum seconds between the end of one profile and the next
+        self.output_dir = output_dir
+        self.profiles_written = 0
+        self._threads = {}
+        self._misses = collections.deque()
+        self._misses_lock = threading.Lock()  # report_frame is called from every capture thread
+        self._sampler = None
+        self._stop = threading.Event()
+        self._last_profile_end = -cooldown
+
+
+    @classmethod
+    def from_config(cls, config):
+        env = os.environ.get(PROFILE_ENV_VAR, "").strip().lower()
+        enabled = env in ("1", "true", "yes", "on") or bool(config.get("profiling_enabled", False))
+        return cls(
+            enabled=enabled,
+            sample_interval=config.get("profiling_sample_interval_ms", 5) / 1000.0,
+            duration=config.get("profiling_duration_s", 10.0)
+        )
+
+
+    def watch(self, name, thread):
+        if thread is not None:
+            self._threads[name] = thread
+
+
+    @property
+    def sampling(self):
+        return self._sampler is not None and self._sampler.is_alive()
+
+
+    def report_frame(self, frame_time, deadline):
+        """
+        Called once per frame. Starts a profile when enough frames miss their deadline.
+        """
+        if not self.enabled or frame_time <= deadline:
+            return
+
+        now = time.monotonic()
+        with self._misses_lock:
+            self._misses.append(now)
+            while self._misses and now - self._misses[0] > self.miss_window:
+                self._misses.popleft()
+
+            if (len(self._misses) >= self.miss_threshold and not self.sampling
+                    and now - self._last_profile_end >= self.cooldown):
+                logger.info(f"{len(self._misses)} frames missed their {deadline * 1000:.1f} ms deadline, profiling for {self.duration:.0f}s.")
+                self._misses.clear()
+                self.start()
+
+
+    def start(self):
+        if self.sampling:
+            return
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+
+
+    def stop(self):
+        self._stop.set()
+        if self.sampling and self._sampler is not threading.current_thread():
+            self._sampler.join(timeout=2)
+
+
+    def _run(self):
+        stacks = collections.Counter()
+        end = time.monotonic() + self.duration
+        while not self._stop.is_set() and time.monotonic() < end:
+            self._sample(stacks)
+            self._stop.wait(self.sample_interval)
+
+        self._last_profile_end = time.monotonic()
+        if stacks:
+            self._write(stacks)
+
+
+    def _sample(self, stacks):
+        frames = sys._current_frames()
+        for name, thread in list(self._threads.items()):
+            frame = frames.get(thread.ident)
+            if frame is None:
+                continue
+            calls = []
+            while frame is not None:
+                code = frame.f_code
+                calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            calls.append(name)
+            stacks[";".join(reversed(calls))] += 1
+
+
+    def _write(self, stacks):
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            path = os.path.join(self.output_dir, f"profile_{time.strftime('%Y%m%d-%H%M%S')}.folded")
+            with open(path, "w") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            self.profiles_written += 1
+            logger.info(f"Profile with {sum(stacks.values())} samples written to {path}")
+        except Exception as e:
+            logger.error(f"Failed to write profile: {e}")